@@ -11,6 +11,7 @@ import (
 	"flashcards-go/internal/auth"
 	"flashcards-go/internal/config"
 	"flashcards-go/internal/db"
+	"flashcards-go/internal/db/queries"
 	"flashcards-go/internal/security"
 
 	"github.com/joho/godotenv"
@@ -20,7 +21,11 @@ import (
 
 func main() {
 	zerolog.TimeFieldFormat = zerolog.TimeFormatUnix
-	log.Logger = log.Output(zerolog.ConsoleWriter{Out: os.Stderr})
+	// ConsoleWriter re-parses and colourises every event, which is only worth it
+	// for a person watching a terminal. Deployed instances log raw JSON.
+	if fi, err := os.Stderr.Stat(); err == nil && fi.Mode()&os.ModeCharDevice != 0 {
+		log.Logger = log.Output(zerolog.ConsoleWriter{Out: os.Stderr})
+	}
 
 	envPaths := []string{".env", "../.env", "../../.env", "../../../.env"}
 	loaded := false
@@ -48,6 +53,7 @@ func main() {
 		log.Fatal().Err(err).Msg("Failed to connect to database")
 	}
 	defer db.Close()
+	queries.StartUserFlagCacheCleanup(5 * time.Minute)
 
 	router := setupRouter(cfg)
 
@@ -49,6 +49,9 @@ func ExchangeCode(ctx context.Context, code string) (*oauth2.Token, error) {
 	return discordOAuthConfig.Exchange(ctx, code)
 }
 
+// FetchUser calls Discord's /users/@me endpoint. It is only needed once, in the
+// OAuth callback; request handlers read the identity stored in the session via
+// GetUserID and GetUsername instead of making another round trip.
 func FetchUser(ctx context.Context, token *oauth2.Token) (*DiscordUser, error) {
 	client := discordOAuthConfig.Client(ctx, token)
 	
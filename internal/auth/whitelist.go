@@ -6,7 +6,13 @@ import (
 	"flashcards-go/internal/db/queries"
 )
 
+// IsUserAdminCtx reports whether userID is an admin. The auth middlewares store
+// the answer on the request context, so a later check for the same user within
+// that request reuses it instead of querying the admins table again.
 func IsUserAdminCtx(ctx context.Context, userID string) bool {
+	if isAdmin, ok := ctx.Value(IsAdminKey).(bool); ok && GetUserID(ctx) == userID {
+		return isAdmin
+	}
 	isAdmin, err := queries.IsUserAdmin(ctx, userID)
 	if err != nil {
 		return false
@@ -333,6 +333,7 @@ func ApproveFlashcard(ctx context.Context, submissionID int, question, answer st
 	if err := tx.Commit(ctx); err != nil {
 		return nil, err
 	}
+	invalidateAnswerPools()
 
 	return &ApproveFlashcardResult{
 		Success:                true,
@@ -452,33 +453,31 @@ type LiveManualDistractor struct {
 	DistractorText string `json:"distractor_text"`
 }
 
-func GetLiveQuestion(ctx context.Context, questionID string) (*LiveQuestion, error) {
+// GetLiveQuestion returns a question and its manual distractors, ordered by
+// id, in one round trip. The question is nil if it does not exist.
+func GetLiveQuestion(ctx context.Context, questionID string) (*LiveQuestion, []LiveManualDistractor, error) {
 	var q LiveQuestion
-	err := db.Pool.QueryRow(ctx, `SELECT id, question, answer FROM questions WHERE id = $1`, questionID).
-		Scan(&q.ID, &q.Question, &q.Answer)
+	var distractorIDs []int
+	var distractorTexts []string
+	err := db.Pool.QueryRow(ctx, `
+		SELECT q.id, q.question, q.answer,
+		       ARRAY(SELECT md.id FROM manual_distractors md WHERE md.question_id = q.id ORDER BY md.id),
+		       ARRAY(SELECT md.distractor_text FROM manual_distractors md WHERE md.question_id = q.id ORDER BY md.id)
+		FROM questions q
+		WHERE q.id = $1
+	`, questionID).Scan(&q.ID, &q.Question, &q.Answer, &distractorIDs, &distractorTexts)
 	if err == pgx.ErrNoRows {
-		return nil, nil
+		return nil, nil, nil
 	}
-	return &q, err
-}
-
-func GetManualDistractorsForQuestion(ctx context.Context, questionID string) ([]LiveManualDistractor, error) {
-	rows, err := db.Pool.Query(ctx, `
-		SELECT id, distractor_text FROM manual_distractors WHERE question_id = $1 ORDER BY id
-	`, questionID)
 	if err != nil {
-		return nil, err
+		return nil, nil, err
 	}
-	defer rows.Close()
-	var ds []LiveManualDistractor
-	for rows.Next() {
-		var d LiveManualDistractor
-		if err := rows.Scan(&d.ID, &d.DistractorText); err != nil {
-			return nil, err
-		}
-		ds = append(ds, d)
+
+	distractors := make([]LiveManualDistractor, len(distractorIDs))
+	for i, id := range distractorIDs {
+		distractors[i] = LiveManualDistractor{ID: id, DistractorText: distractorTexts[i]}
 	}
-	return ds, rows.Err()
+	return &q, distractors, nil
 }
 
 func UpdateQuestionText(ctx context.Context, questionID, newText string) error {
@@ -488,6 +487,7 @@ func UpdateQuestionText(ctx context.Context, questionID, newText string) error {
 
 func DeleteQuestion(ctx context.Context, questionID string) error {
 	_, err := db.Pool.Exec(ctx, `DELETE FROM questions WHERE id = $1`, questionID)
+	invalidateAnswerPools()
 	return err
 }
 
@@ -496,10 +496,30 @@ func DeleteManualDistractorByID(ctx context.Context, distractorID int) error {
 	return err
 }
 
+// ApplyManualDistractorEdits deletes and rewrites manual distractors in a single
+// statement. updateIDs and updateTexts are parallel; an id should not appear in
+// both deleteIDs and updateIDs.
+func ApplyManualDistractorEdits(ctx context.Context, deleteIDs, updateIDs []int, updateTexts []string) error {
+	if len(deleteIDs) == 0 && len(updateIDs) == 0 {
+		return nil
+	}
+	_, err := db.Pool.Exec(ctx, `
+		WITH deleted AS (
+			DELETE FROM manual_distractors WHERE id = ANY($1::int[])
+		)
+		UPDATE manual_distractors md
+		SET distractor_text = u.distractor_text
+		FROM unnest($2::int[], $3::text[]) AS u(id, distractor_text)
+		WHERE md.id = u.id
+	`, deleteIDs, updateIDs, updateTexts)
+	return err
+}
+
 func UpdateQuestionAnswer(ctx context.Context, questionID, newAnswer string) error {
 	_, err := db.Pool.Exec(ctx, `
 		UPDATE questions SET answer = $1, updated_at = NOW() WHERE id = $2
 	`, newAnswer, questionID)
+	invalidateAnswerPools()
 	return err
 }
 
@@ -510,29 +530,48 @@ func UpdateManualDistractor(ctx context.Context, distractorID int, newText strin
 	return err
 }
 
-func InsertSubmittedFlashcard(ctx context.Context, userID, username, question, answer, module string, topic, subtopic, tags *string) (int, error) {
-	var id int
+// InsertSubmittedFlashcard stores a submitted flashcard together with its
+// distractors in one statement and returns the new flashcard id and the number
+// of distractors inserted.
+func InsertSubmittedFlashcard(ctx context.Context, userID, username, question, answer, module string, topic, subtopic, tags *string, distractors []string) (int, int, error) {
+	var id, count int
 	err := db.Pool.QueryRow(ctx, `
-		INSERT INTO submitted_flashcards (user_id, username, submitted_question, submitted_answer, 
-		                                  module, submitted_topic, submitted_subtopic, submitted_tags_comma_separated)
-		VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-		RETURNING id
-	`, userID, username, question, answer, module, topic, subtopic, tags).Scan(&id)
-	return id, err
+		WITH fc AS (
+			INSERT INTO submitted_flashcards (user_id, username, submitted_question, submitted_answer, 
+			                                  module, submitted_topic, submitted_subtopic, submitted_tags_comma_separated)
+			VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+			RETURNING id
+		), d AS (
+			INSERT INTO submitted_distractors (user_id, username, question_id, distractor_text)
+			SELECT $1, $2, 'flashcard_' || fc.id, t
+			FROM fc, unnest($9::text[]) AS t
+			RETURNING 1
+		)
+		SELECT fc.id, (SELECT COUNT(*) FROM d)
+		FROM fc
+	`, userID, username, question, answer, module, topic, subtopic, tags, distractors).Scan(&id, &count)
+	return id, count, err
 }
 
-func InsertSubmittedDistractor(ctx context.Context, userID, username, questionID, distractorText string) error {
-	_, err := db.Pool.Exec(ctx, `
+// InsertSubmittedDistractors stores several distractors for one question in a
+// single statement and returns how many were inserted.
+func InsertSubmittedDistractors(ctx context.Context, userID, username, questionID string, distractors []string) (int, error) {
+	tag, err := db.Pool.Exec(ctx, `
 		INSERT INTO submitted_distractors (user_id, username, question_id, distractor_text)
-		VALUES ($1, $2, $3, $4)
-	`, userID, username, questionID, distractorText)
-	return err
+		SELECT $1, $2, $3, unnest($4::text[])
+	`, userID, username, questionID, distractors)
+	if err != nil {
+		return 0, err
+	}
+	return int(tag.RowsAffected()), nil
 }
 
+// InsertReportedQuestion stores a report. When questionID is nil the question
+// is looked up by its text in the same statement.
 func InsertReportedQuestion(ctx context.Context, userID, username, question string, questionID *string, message, distractors *string) error {
 	_, err := db.Pool.Exec(ctx, `
 		INSERT INTO reported_questions (user_id, username, question, question_id, message, distractors)
-		VALUES ($1, $2, $3, $4, $5, $6)
+		VALUES ($1, $2, $3, COALESCE($4, (SELECT id FROM questions WHERE question = $3 LIMIT 1)), $5, $6)
 	`, userID, username, question, questionID, message, distractors)
 	return err
 }
@@ -2,91 +2,320 @@ package queries
 
 import (
 	"context"
+	"math/bits"
+	"math/rand"
+	"strconv"
+	"sync"
+	"time"
 
 	"flashcards-go/internal/db"
+
+	"golang.org/x/sync/singleflight"
 )
 
-func GetManualDistractors(ctx context.Context, questionID string, limit int) ([]Distractor, error) {
-	rows, err := db.Pool.Query(ctx, `
-		SELECT id, distractor_text
-		FROM manual_distractors
-		WHERE question_id = $1
-		LIMIT $2
-	`, questionID, limit)
+// answerPoolTTL bounds how long a module's distractor candidates are reused
+// before being reloaded, so new or edited questions show up within a minute.
+const answerPoolTTL = 60 * time.Second
+
+// answerPoolLoadTimeout bounds a shared pool load. The load runs detached from
+// the request that started it, since other requests may be waiting on it.
+const answerPoolLoadTimeout = 10 * time.Second
+
+// bitset holds one bit per interned topic, subtopic or tag name.
+type bitset []uint64
+
+// overlap counts the bits set in both a and b.
+func (a bitset) overlap(b bitset) int {
+	if len(b) < len(a) {
+		a, b = b, a
+	}
+	n := 0
+	for i, w := range a {
+		n += bits.OnesCount64(w & b[i])
+	}
+	return n
+}
+
+// count returns the number of bits set.
+func (a bitset) count() int {
+	n := 0
+	for _, w := range a {
+		n += bits.OnesCount64(w)
+	}
+	return n
+}
+
+// vocab interns names to dense bit positions within one answer pool.
+type vocab map[string]int
+
+// bitset returns the set of names as bits. When grow is false, names that are
+// not in the vocabulary are skipped since no pool answer can share them.
+func (v vocab) bitset(names []string, grow bool) bitset {
+	var set bitset
+	for _, name := range names {
+		idx, ok := v[name]
+		if !ok {
+			if !grow {
+				continue
+			}
+			idx = len(v)
+			v[name] = idx
+		}
+		for len(set) <= idx/64 {
+			set = append(set, 0)
+		}
+		set[idx/64] |= 1 << uint(idx%64)
+	}
+	return set
+}
+
+type poolAnswer struct {
+	ID        string
+	Answer    string
+	Topics    bitset
+	Subtopics bitset
+	Tags      bitset
+
+	// Sorted names, kept so question metadata can be served from the pool.
+	TopicNames    []string
+	SubtopicNames []string
+	TagNames      []string
+}
+
+type answerPool struct {
+	answers   []poolAnswer
+	index     map[string]int
+	topics    vocab
+	subtopics vocab
+	tags      vocab
+	loadedAt  time.Time
+}
+
+var (
+	answerPools   = make(map[int]*answerPool)
+	answerPoolsMu sync.RWMutex
+
+	// answerPoolGen is bumped by invalidateAnswerPools. Loads started under an
+	// older generation don't store their result, and new loads don't join them.
+	answerPoolGen uint64
+
+	// answerPoolLoads collapses concurrent reloads of the same module so an
+	// expired pool is fetched once rather than once per waiting request.
+	answerPoolLoads singleflight.Group
+)
+
+// getModuleAnswerPool returns every non-blank answer in a module with its
+// topic/subtopic/tag names interned into bitsets, loading them in one query
+// when the cached copy is missing or older than answerPoolTTL.
+func getModuleAnswerPool(ctx context.Context, moduleID int) (*answerPool, error) {
+	answerPoolsMu.RLock()
+	pool, ok := answerPools[moduleID]
+	gen := answerPoolGen
+	answerPoolsMu.RUnlock()
+	if ok && time.Since(pool.loadedAt) < answerPoolTTL {
+		return pool, nil
+	}
+
+	key := strconv.Itoa(moduleID) + ":" + strconv.FormatUint(gen, 10)
+	v, err, _ := answerPoolLoads.Do(key, func() (interface{}, error) {
+		loadCtx, cancel := context.WithTimeout(context.WithoutCancel(ctx), answerPoolLoadTimeout)
+		defer cancel()
+		return loadModuleAnswerPool(loadCtx, moduleID, gen)
+	})
 	if err != nil {
 		return nil, err
 	}
-	defer rows.Close()
+	return v.(*answerPool), nil
+}
 
-	var distractors []Distractor
-	for rows.Next() {
-		var d Distractor
-		var id int
-		if err := rows.Scan(&id, &d.Answer); err != nil {
-			return nil, err
-		}
-		d.Type = "manual_distractor"
-		d.Metadata = &id
-		distractors = append(distractors, d)
+// invalidateAnswerPools drops every cached pool so question edits show up in
+// distractors and metadata straight away rather than after answerPoolTTL.
+func invalidateAnswerPools() {
+	answerPoolsMu.Lock()
+	answerPools = make(map[int]*answerPool)
+	answerPoolGen++
+	answerPoolsMu.Unlock()
+}
+
+// GetPooledQuestionMetadata returns a question's sorted topic, subtopic and tag
+// names from its module's answer pool, so metadata is read at most once per
+// pool refresh. Questions missing from the pool fall back to
+// GetQuestionMetadata. Callers must not modify the returned slices.
+func GetPooledQuestionMetadata(ctx context.Context, moduleID int, questionID string) (topics, subtopics, tags []string, err error) {
+	pool, err := getModuleAnswerPool(ctx, moduleID)
+	if err != nil {
+		return nil, nil, nil, err
 	}
-	return distractors, rows.Err()
+	if i, ok := pool.index[questionID]; ok {
+		a := &pool.answers[i]
+		return a.TopicNames, a.SubtopicNames, a.TagNames, nil
+	}
+	return GetQuestionMetadata(ctx, questionID)
 }
 
-func GetSmartDistractors(ctx context.Context, questionID string, moduleID int, questionTopics, questionSubtopics, questionTags []string, limit int) ([]Distractor, error) {
-	query := `
-		SELECT 
+// loadModuleAnswerPool reads a module's answer pool and caches it, unless the
+// pools were invalidated since generation gen was read.
+func loadModuleAnswerPool(ctx context.Context, moduleID int, gen uint64) (*answerPool, error) {
+	rows, err := db.Pool.Query(ctx, `
+		SELECT
 			q.id,
 			q.answer,
-			(
-				COALESCE((
-					SELECT COUNT(*) FROM question_topics qt2
-					JOIN topics t2 ON qt2.topic_id = t2.id
-					WHERE qt2.question_id = q.id 
-					  AND t2.name = ANY($2::text[])
-				), 0) * 3 +
-				COALESCE((
-					SELECT COUNT(*) FROM question_subtopics qst2
-					JOIN subtopics st2 ON qst2.subtopic_id = st2.id
-					WHERE qst2.question_id = q.id 
-					  AND st2.name = ANY($3::text[])
-				), 0) * 2 +
-				COALESCE((
-					SELECT COUNT(*) FROM question_tags qtag2
-					JOIN tags tag2 ON qtag2.tag_id = tag2.id
-					WHERE qtag2.question_id = q.id 
-					  AND tag2.name = ANY($4::text[])
-				), 0) * 1 +
-				CASE WHEN EXISTS (
-					SELECT 1 FROM question_topics qt3
-					JOIN topics t3 ON qt3.topic_id = t3.id
-					WHERE qt3.question_id = q.id 
-					  AND t3.name = ANY($2::text[])
-				) THEN 2 ELSE 0 END
-			) as similarity_score
+			ARRAY(SELECT t.name FROM question_topics qt JOIN topics t ON qt.topic_id = t.id WHERE qt.question_id = q.id ORDER BY t.name),
+			ARRAY(SELECT st.name FROM question_subtopics qst JOIN subtopics st ON qst.subtopic_id = st.id WHERE qst.question_id = q.id ORDER BY st.name),
+			ARRAY(SELECT tag.name FROM question_tags qtag JOIN tags tag ON qtag.tag_id = tag.id WHERE qtag.question_id = q.id ORDER BY tag.name)
 		FROM questions q
-		WHERE q.module_id = $5
-		  AND q.id != $1
+		WHERE q.module_id = $1
 		  AND q.answer IS NOT NULL
-		  AND q.answer != ''
-		ORDER BY similarity_score DESC, random()
-		LIMIT $6
-	`
-
-	rows, err := db.Pool.Query(ctx, query, questionID, questionTopics, questionSubtopics, questionTags, moduleID, limit)
+		  AND trim(q.answer) != ''
+	`, moduleID)
 	if err != nil {
 		return nil, err
 	}
 	defer rows.Close()
 
-	var distractors []Distractor
+	pool := &answerPool{index: make(map[string]int), topics: vocab{}, subtopics: vocab{}, tags: vocab{}}
 	for rows.Next() {
-		var d Distractor
-		var score int
-		if err := rows.Scan(&d.ID, &d.Answer, &score); err != nil {
+		var a poolAnswer
+		if err := rows.Scan(&a.ID, &a.Answer, &a.TopicNames, &a.SubtopicNames, &a.TagNames); err != nil {
 			return nil, err
 		}
-		d.Type = "question"
-		distractors = append(distractors, d)
+		a.Topics = pool.topics.bitset(a.TopicNames, true)
+		a.Subtopics = pool.subtopics.bitset(a.SubtopicNames, true)
+		a.Tags = pool.tags.bitset(a.TagNames, true)
+		pool.index[a.ID] = len(pool.answers)
+		pool.answers = append(pool.answers, a)
+	}
+	if err := rows.Err(); err != nil {
+		return nil, err
+	}
+	pool.loadedAt = time.Now()
+
+	answerPoolsMu.Lock()
+	if answerPoolGen == gen {
+		answerPools[moduleID] = pool
+	}
+	answerPoolsMu.Unlock()
+
+	return pool, nil
+}
+
+// GetSmartDistractors picks the answers in the module most similar to the
+// question: 3 per shared topic, 2 per shared subtopic, 1 per shared tag, plus
+// 2 if any topic is shared. Ties are broken randomly.
+func GetSmartDistractors(ctx context.Context, questionID string, moduleID int, questionTopics, questionSubtopics, questionTags []string, limit int) ([]Distractor, error) {
+	pool, err := getModuleAnswerPool(ctx, moduleID)
+	if err != nil {
+		return nil, err
+	}
+
+	// When the pool holds no more candidates than are wanted, every one of
+	// them is picked anyway, so skip scoring.
+	self, inPool := pool.index[questionID]
+	candidateCount := len(pool.answers)
+	if inPool {
+		candidateCount--
+	}
+	if candidateCount <= limit {
+		distractors := make([]Distractor, 0, candidateCount)
+		for i := range pool.answers {
+			if inPool && i == self {
+				continue
+			}
+			distractors = append(distractors, Distractor{ID: pool.answers[i].ID, Answer: pool.answers[i].Answer, Type: "question"})
+		}
+		return distractors, nil
+	}
+
+	// The question is normally in its own module's pool with its bitsets
+	// already built. Otherwise intern its names against the pool's
+	// vocabularies, which are never written after loading.
+	var topics, subtopics, tags bitset
+	if inPool {
+		topics, subtopics, tags = pool.answers[self].Topics, pool.answers[self].Subtopics, pool.answers[self].Tags
+	} else {
+		topics = pool.topics.bitset(questionTopics, false)
+		subtopics = pool.subtopics.bitset(questionSubtopics, false)
+		tags = pool.tags.bitset(questionTags, false)
+	}
+
+	// Overlaps are bounded by the question's own set sizes, so the score
+	// counts fit in a slice indexed by score.
+	maxScore := topics.count()*3 + 2 + subtopics.count()*2 + tags.count()
+	answers := pool.answers
+	scores := make([]int, len(answers))
+	scoreCounts := make([]int, maxScore+1)
+	for i := range answers {
+		if inPool && i == self {
+			scores[i] = -1
+			continue
+		}
+		a := &answers[i]
+		topicMatches := a.Topics.overlap(topics)
+		score := topicMatches*3 + a.Subtopics.overlap(subtopics)*2 + a.Tags.overlap(tags)
+		if topicMatches > 0 {
+			score += 2
+		}
+		scores[i] = score
+		scoreCounts[score]++
+	}
+
+	candidates := topScored(answers, scores, scoreCounts, limit)
+
+	distractors := make([]Distractor, len(candidates))
+	for i, a := range candidates {
+		distractors[i] = Distractor{ID: a.ID, Answer: a.Answer, Type: "question"}
+	}
+	return distractors, nil
+}
+
+// topScored returns up to k pool entries with the highest non-negative scores
+// without sorting the whole pool. scoreCounts[s] is how many entries scored s,
+// so the cutoff is found by walking it from the top; everything above the
+// cutoff is taken and the remaining slots are filled by reservoir-sampling the
+// candidates tied at it.
+func topScored(pool []poolAnswer, scores []int, scoreCounts []int, k int) []*poolAnswer {
+	if k <= 0 {
+		return nil
+	}
+
+	cutoff, above, lowest := -1, 0, -1
+	for score := len(scoreCounts) - 1; score >= 0; score-- {
+		n := scoreCounts[score]
+		if n == 0 {
+			continue
+		}
+		lowest = score
+		if above+n >= k {
+			cutoff = score
+			break
+		}
+		above += n
+	}
+	if cutoff < 0 {
+		// Fewer than k candidates: take all of them.
+		if lowest < 0 {
+			return nil
+		}
+		cutoff = lowest
+		above -= scoreCounts[lowest]
+		k = above + scoreCounts[lowest]
+	}
+
+	picked := make([]*poolAnswer, 0, k)
+	ties := make([]*poolAnswer, 0, k-above)
+	seen := 0
+	for i, score := range scores {
+		switch {
+		case score > cutoff:
+			picked = append(picked, &pool[i])
+		case score == cutoff:
+			seen++
+			if len(ties) < k-above {
+				ties = append(ties, &pool[i])
+			} else if j := rand.Intn(seen); j < len(ties) {
+				ties[j] = &pool[i]
+			}
+		}
 	}
-	return distractors, rows.Err()
+	return append(picked, ties...)
 }
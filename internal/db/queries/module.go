@@ -2,6 +2,8 @@ package queries
 
 import (
 	"context"
+	"sync"
+	"time"
 
 	"flashcards-go/internal/db"
 
@@ -14,35 +16,151 @@ type Module struct {
 	Year *int    `json:"year,omitempty"`
 }
 
+// GetAllModules returns every module ordered by year then name. The list is
+// served from the module cache, so the landing page does not scan the modules
+// table on every load.
 func GetAllModules(ctx context.Context) ([]Module, error) {
+	modules, _, err := GetAllModulesWithExpiry(ctx)
+	return modules, err
+}
+
+// GetAllModulesWithExpiry is GetAllModules plus the time the returned list is
+// next refreshed, so callers caching something derived from it can expire
+// with it rather than stacking their own TTL on top.
+func GetAllModulesWithExpiry(ctx context.Context) ([]Module, time.Time, error) {
+	if err := refreshModuleCache(ctx); err != nil {
+		return nil, time.Time{}, err
+	}
+
+	moduleCacheMu.RLock()
+	modules := make([]Module, len(moduleList))
+	copy(modules, moduleList)
+	expires := moduleCacheExpires
+	moduleCacheMu.RUnlock()
+	return modules, expires, nil
+}
+
+const (
+	moduleIDByNameSQL = `SELECT id FROM modules WHERE name = $1`
+	moduleNameByIDSQL = `SELECT name FROM modules WHERE id = $1`
+)
+
+// moduleCacheTTL is how long the module name/id maps are trusted before the
+// modules table is scanned again.
+const moduleCacheTTL = 5 * time.Minute
+
+var (
+	moduleIDs          = make(map[string]int)
+	moduleNames        = make(map[int]string)
+	moduleList         []Module
+	moduleCacheExpires time.Time
+	moduleCacheMu      sync.RWMutex
+)
+
+// GetModuleIDByName resolves a module name from a process-local map that is
+// rebuilt from a single scan of the modules table every moduleCacheTTL. Names
+// missing from the map fall back to a direct lookup so newly added modules are
+// picked up.
+func GetModuleIDByName(ctx context.Context, name string) (int, error) {
+	if err := refreshModuleCache(ctx); err != nil {
+		return 0, err
+	}
+
+	moduleCacheMu.RLock()
+	id, ok := moduleIDs[name]
+	moduleCacheMu.RUnlock()
+	if ok {
+		return id, nil
+	}
+
+	err := db.Pool.QueryRow(ctx, moduleIDByNameSQL, name).Scan(&id)
+	if err == pgx.ErrNoRows {
+		return 0, nil
+	}
+	if err != nil {
+		return 0, err
+	}
+
+	cacheModule(id, name)
+	return id, nil
+}
+
+// GetModuleNameByID is the id to name counterpart of GetModuleIDByName and
+// shares its cache.
+func GetModuleNameByID(ctx context.Context, moduleID int) (string, error) {
+	if err := refreshModuleCache(ctx); err != nil {
+		return "", err
+	}
+
+	moduleCacheMu.RLock()
+	name, ok := moduleNames[moduleID]
+	moduleCacheMu.RUnlock()
+	if ok {
+		return name, nil
+	}
+
+	err := db.Pool.QueryRow(ctx, moduleNameByIDSQL, moduleID).Scan(&name)
+	if err == pgx.ErrNoRows {
+		return "", nil
+	}
+	if err != nil {
+		return "", err
+	}
+
+	cacheModule(moduleID, name)
+	return name, nil
+}
+
+func cacheModule(id int, name string) {
+	moduleCacheMu.Lock()
+	moduleIDs[name] = id
+	moduleNames[id] = name
+	moduleCacheMu.Unlock()
+}
+
+// refreshModuleCache rebuilds the module maps and ordered list when they have
+// expired.
+func refreshModuleCache(ctx context.Context) error {
+	moduleCacheMu.RLock()
+	fresh := time.Now().Before(moduleCacheExpires)
+	moduleCacheMu.RUnlock()
+	if fresh {
+		return nil
+	}
+
 	rows, err := db.Pool.Query(ctx, `
 		SELECT id, name, year
 		FROM modules
 		ORDER BY year NULLS LAST, name
 	`)
 	if err != nil {
-		return nil, err
+		return err
 	}
 	defer rows.Close()
 
-	var modules []Module
+	ids := make(map[string]int)
+	names := make(map[int]string)
+	var list []Module
 	for rows.Next() {
 		var m Module
 		if err := rows.Scan(&m.ID, &m.Name, &m.Year); err != nil {
-			return nil, err
+			return err
 		}
-		modules = append(modules, m)
+		ids[m.Name] = m.ID
+		names[m.ID] = m.Name
+		list = append(list, m)
 	}
-	return modules, rows.Err()
-}
-
-func GetModuleIDByName(ctx context.Context, name string) (int, error) {
-	var id int
-	err := db.Pool.QueryRow(ctx, `SELECT id FROM modules WHERE name = $1`, name).Scan(&id)
-	if err == pgx.ErrNoRows {
-		return 0, nil
+	if err := rows.Err(); err != nil {
+		return err
 	}
-	return id, err
+
+	moduleCacheMu.Lock()
+	moduleIDs = ids
+	moduleNames = names
+	moduleList = list
+	moduleCacheExpires = time.Now().Add(moduleCacheTTL)
+	moduleCacheMu.Unlock()
+	return nil
 }
 
 type FilterItem struct {
@@ -50,32 +168,21 @@ type FilterItem struct {
 	Count int    `json:"count"`
 }
 
+// GetModuleFilterData returns the topic, subtopic and tag filter options for a
+// module in one round trip. Subtopics and tags are narrowed to questions that
+// carry one of the selected topics, if any are given.
 func GetModuleFilterData(ctx context.Context, moduleID int, selectedTopics []string) (topics, subtopics, tags []FilterItem, err error) {
-	topicsQuery := `
-		SELECT t.name, COUNT(DISTINCT q.id) as count
+	query := `
+		SELECT 'topic' AS kind, t.name, COUNT(DISTINCT q.id) as count
 		FROM topics t
 		JOIN question_topics qt ON t.id = qt.topic_id
 		JOIN questions q ON qt.question_id = q.id
 		WHERE q.module_id = $1
 		GROUP BY t.name
-		ORDER BY t.name
-	`
-	rows, err := db.Pool.Query(ctx, topicsQuery, moduleID)
-	if err != nil {
-		return nil, nil, nil, err
-	}
-	for rows.Next() {
-		var item FilterItem
-		if err := rows.Scan(&item.Name, &item.Count); err != nil {
-			rows.Close()
-			return nil, nil, nil, err
-		}
-		topics = append(topics, item)
-	}
-	rows.Close()
 
-	subtopicsQuery := `
-		SELECT st.name, COUNT(DISTINCT q.id) as count
+		UNION ALL
+
+		SELECT 'subtopic' AS kind, st.name, COUNT(DISTINCT q.id) as count
 		FROM subtopics st
 		JOIN question_subtopics qst ON st.id = qst.subtopic_id
 		JOIN questions q ON qst.question_id = q.id
@@ -86,24 +193,10 @@ func GetModuleFilterData(ctx context.Context, moduleID int, selectedTopics []str
 			WHERE qt2.question_id = q.id AND t2.name = ANY($2)
 		  ))
 		GROUP BY st.name
-		ORDER BY st.name
-	`
-	rows, err = db.Pool.Query(ctx, subtopicsQuery, moduleID, selectedTopics)
-	if err != nil {
-		return nil, nil, nil, err
-	}
-	for rows.Next() {
-		var item FilterItem
-		if err := rows.Scan(&item.Name, &item.Count); err != nil {
-			rows.Close()
-			return nil, nil, nil, err
-		}
-		subtopics = append(subtopics, item)
-	}
-	rows.Close()
 
-	tagsQuery := `
-		SELECT tag.name, COUNT(DISTINCT q.id) as count
+		UNION ALL
+
+		SELECT 'tag' AS kind, tag.name, COUNT(DISTINCT q.id) as count
 		FROM tags tag
 		JOIN question_tags qtag ON tag.id = qtag.tag_id
 		JOIN questions q ON qtag.question_id = q.id
@@ -114,21 +207,30 @@ func GetModuleFilterData(ctx context.Context, moduleID int, selectedTopics []str
 			WHERE qt2.question_id = q.id AND t2.name = ANY($2)
 		  ))
 		GROUP BY tag.name
-		ORDER BY tag.name
+
+		ORDER BY 2
 	`
-	rows, err = db.Pool.Query(ctx, tagsQuery, moduleID, selectedTopics)
+	rows, err := db.Pool.Query(ctx, query, moduleID, selectedTopics)
 	if err != nil {
 		return nil, nil, nil, err
 	}
+	defer rows.Close()
+
 	for rows.Next() {
+		var kind string
 		var item FilterItem
-		if err := rows.Scan(&item.Name, &item.Count); err != nil {
-			rows.Close()
+		if err := rows.Scan(&kind, &item.Name, &item.Count); err != nil {
 			return nil, nil, nil, err
 		}
-		tags = append(tags, item)
+		switch kind {
+		case "topic":
+			topics = append(topics, item)
+		case "subtopic":
+			subtopics = append(subtopics, item)
+		case "tag":
+			tags = append(tags, item)
+		}
 	}
-	rows.Close()
 
 	return topics, subtopics, tags, rows.Err()
 }
@@ -3,10 +3,10 @@ package queries
 import (
 	"context"
 	"strconv"
+	"sync"
+	"time"
 
 	"flashcards-go/internal/db"
-
-	"github.com/jackc/pgx/v5"
 )
 
 // SubmittedPDF represents a PDF awaiting admin approval
@@ -42,6 +42,62 @@ func InsertSubmittedPDF(ctx context.Context, pdf PDFInsert, topicIDs, subtopicID
 	return id, err
 }
 
+// InsertSubmittedPDFs queues several PDFs that share the same topics,
+// subtopics and tags for approval in one statement, returning their ids in
+// the order given
+func InsertSubmittedPDFs(ctx context.Context, pdfs []PDFInsert, topicIDs, subtopicIDs, tagIDs []int) ([]int, error) {
+	if len(pdfs) == 0 {
+		return nil, nil
+	}
+
+	paths := make([]string, len(pdfs))
+	filenames := make([]string, len(pdfs))
+	sizes := make([]int64, len(pdfs))
+	mimeTypes := make([]string, len(pdfs))
+	moduleIDs := make([]int, len(pdfs))
+	uploaders := make([]string, len(pdfs))
+	for i, p := range pdfs {
+		paths[i] = p.StoragePath
+		filenames[i] = p.OriginalFilename
+		sizes[i] = p.FileSize
+		mimeTypes[i] = p.MimeType
+		moduleIDs[i] = p.ModuleID
+		uploaders[i] = p.UploadedBy
+	}
+
+	rows, err := db.Pool.Query(ctx, `
+		INSERT INTO submitted_pdfs (storage_path, original_filename, file_size, mime_type, module_id, uploaded_by, topic_ids, subtopic_ids, tag_ids)
+		SELECT u.storage_path, u.original_filename, u.file_size, u.mime_type, u.module_id, u.uploaded_by, $7, $8, $9
+		FROM unnest($1::text[], $2::text[], $3::bigint[], $4::text[], $5::int[], $6::text[])
+		     AS u(storage_path, original_filename, file_size, mime_type, module_id, uploaded_by)
+		RETURNING id, storage_path
+	`, paths, filenames, sizes, mimeTypes, moduleIDs, uploaders, topicIDs, subtopicIDs, tagIDs)
+	if err != nil {
+		return nil, err
+	}
+	defer rows.Close()
+
+	// Storage paths are unique per upload, so they map rows back to inputs.
+	idsByPath := make(map[string]int, len(pdfs))
+	for rows.Next() {
+		var id int
+		var path string
+		if err := rows.Scan(&id, &path); err != nil {
+			return nil, err
+		}
+		idsByPath[path] = id
+	}
+	if err := rows.Err(); err != nil {
+		return nil, err
+	}
+
+	ids := make([]int, len(pdfs))
+	for i, path := range paths {
+		ids[i] = idsByPath[path]
+	}
+	return ids, nil
+}
+
 // ListSubmittedPDFs returns all PDFs pending approval, with resolved names
 func ListSubmittedPDFs(ctx context.Context) ([]SubmittedPDF, error) {
 	rows, err := db.Pool.Query(ctx, `
@@ -124,17 +180,30 @@ func ApproveSubmittedPDF(ctx context.Context, submittedID int) (int, error) {
 		return 0, err
 	}
 
-	// Link topics
-	for _, topicID := range topicIDs {
-		tx.Exec(ctx, `INSERT INTO pdf_topics (pdf_id, topic_id) VALUES ($1, $2) ON CONFLICT DO NOTHING`, newID, topicID)
+	// Link topics, subtopics and tags, one statement per table
+	_, err = tx.Exec(ctx, `
+		INSERT INTO pdf_topics (pdf_id, topic_id)
+		SELECT $1, unnest($2::int[])
+		ON CONFLICT DO NOTHING
+	`, newID, topicIDs)
+	if err != nil {
+		return 0, err
 	}
-	// Link subtopics
-	for _, subtopicID := range subtopicIDs {
-		tx.Exec(ctx, `INSERT INTO pdf_subtopics (pdf_id, subtopic_id) VALUES ($1, $2) ON CONFLICT DO NOTHING`, newID, subtopicID)
+	_, err = tx.Exec(ctx, `
+		INSERT INTO pdf_subtopics (pdf_id, subtopic_id)
+		SELECT $1, unnest($2::int[])
+		ON CONFLICT DO NOTHING
+	`, newID, subtopicIDs)
+	if err != nil {
+		return 0, err
 	}
-	// Link tags
-	for _, tagID := range tagIDs {
-		tx.Exec(ctx, `INSERT INTO pdf_tags (pdf_id, tag_id, count) VALUES ($1, $2, 1) ON CONFLICT DO NOTHING`, newID, tagID)
+	_, err = tx.Exec(ctx, `
+		INSERT INTO pdf_tags (pdf_id, tag_id, count)
+		SELECT $1, unnest($2::int[]), 1
+		ON CONFLICT DO NOTHING
+	`, newID, tagIDs)
+	if err != nil {
+		return 0, err
 	}
 
 	// Remove from submitted
@@ -143,7 +212,11 @@ func ApproveSubmittedPDF(ctx context.Context, submittedID int) (int, error) {
 		return 0, err
 	}
 
-	return newID, tx.Commit(ctx)
+	if err := tx.Commit(ctx); err != nil {
+		return 0, err
+	}
+	invalidateQuestionPDFCache()
+	return newID, nil
 }
 
 // RejectSubmittedPDF deletes a submitted PDF and returns its storage_path for cleanup
@@ -248,6 +321,9 @@ func InsertPDF(ctx context.Context, pdf PDFInsert) (int, error) {
 		VALUES ($1, $2, $3, $4, $5, $6, true)
 		RETURNING id
 	`, pdf.StoragePath, pdf.OriginalFilename, pdf.FileSize, pdf.MimeType, pdf.ModuleID, pdf.UploadedBy).Scan(&id)
+	if err == nil {
+		invalidateQuestionPDFCache()
+	}
 	return id, err
 }
 
@@ -256,135 +332,148 @@ func UpdatePDFMetadata(ctx context.Context, pdfID int, moduleID int) error {
 	_, err := db.Pool.Exec(ctx, `
 		UPDATE pdfs SET module_id = $2 WHERE id = $1
 	`, pdfID, moduleID)
+	invalidateQuestionPDFCache()
 	return err
 }
 
-// SetPDFTopics replaces all topics for a PDF
-func SetPDFTopics(ctx context.Context, pdfID int, topicIDs []int) error {
-	tx, err := db.Pool.Begin(ctx)
-	if err != nil {
-		return err
-	}
-	defer tx.Rollback(ctx)
-
-	// Delete existing topics
-	_, err = tx.Exec(ctx, `DELETE FROM pdf_topics WHERE pdf_id = $1`, pdfID)
-	if err != nil {
-		return err
-	}
-
-	// Insert new topics
-	for _, topicID := range topicIDs {
-		_, err = tx.Exec(ctx, `INSERT INTO pdf_topics (pdf_id, topic_id) VALUES ($1, $2)`, pdfID, topicID)
-		if err != nil {
-			return err
-		}
+// SetPDFLabels replaces the topics, subtopics and tags of a PDF in a single
+// transaction. A nil slice leaves that kind of label unchanged.
+func SetPDFLabels(ctx context.Context, pdfID int, topicIDs, subtopicIDs, tagIDs []int) error {
+	if topicIDs == nil && subtopicIDs == nil && tagIDs == nil {
+		return nil
 	}
 
-	return tx.Commit(ctx)
-}
-
-// SetPDFSubtopics replaces all subtopics for a PDF
-func SetPDFSubtopics(ctx context.Context, pdfID int, subtopicIDs []int) error {
 	tx, err := db.Pool.Begin(ctx)
 	if err != nil {
 		return err
 	}
 	defer tx.Rollback(ctx)
 
-	// Delete existing subtopics
-	_, err = tx.Exec(ctx, `DELETE FROM pdf_subtopics WHERE pdf_id = $1`, pdfID)
-	if err != nil {
-		return err
-	}
-
-	// Insert new subtopics
-	for _, subtopicID := range subtopicIDs {
-		_, err = tx.Exec(ctx, `INSERT INTO pdf_subtopics (pdf_id, subtopic_id) VALUES ($1, $2)`, pdfID, subtopicID)
-		if err != nil {
+	labels := []struct {
+		ids       []int
+		deleteSQL string
+		insertSQL string
+	}{
+		{topicIDs, `DELETE FROM pdf_topics WHERE pdf_id = $1`,
+			`INSERT INTO pdf_topics (pdf_id, topic_id) SELECT $1, unnest($2::int[])`},
+		{subtopicIDs, `DELETE FROM pdf_subtopics WHERE pdf_id = $1`,
+			`INSERT INTO pdf_subtopics (pdf_id, subtopic_id) SELECT $1, unnest($2::int[])`},
+		{tagIDs, `DELETE FROM pdf_tags WHERE pdf_id = $1`,
+			`INSERT INTO pdf_tags (pdf_id, tag_id, count) SELECT $1, unnest($2::int[]), 1`},
+	}
+	for _, l := range labels {
+		if l.ids == nil {
+			continue
+		}
+		if _, err := tx.Exec(ctx, l.deleteSQL, pdfID); err != nil {
+			return err
+		}
+		if _, err := tx.Exec(ctx, l.insertSQL, pdfID, l.ids); err != nil {
 			return err
 		}
 	}
 
-	return tx.Commit(ctx)
+	if err := tx.Commit(ctx); err != nil {
+		return err
+	}
+	invalidateQuestionPDFCache()
+	return nil
 }
 
-// SetPDFTags replaces all tags for a PDF
-func SetPDFTags(ctx context.Context, pdfID int, tagIDs []int) error {
-	tx, err := db.Pool.Begin(ctx)
-	if err != nil {
-		return err
+// GetOrCreatePDFLabels resolves topic, subtopic and tag names together,
+// creating any that don't exist, in a single statement
+func GetOrCreatePDFLabels(ctx context.Context, topicNames, subtopicNames, tagNames []string) (topicIDs, subtopicIDs, tagIDs []int, err error) {
+	if len(topicNames) == 0 && len(subtopicNames) == 0 && len(tagNames) == 0 {
+		return nil, nil, nil, nil
 	}
-	defer tx.Rollback(ctx)
 
-	// Delete existing tags
-	_, err = tx.Exec(ctx, `DELETE FROM pdf_tags WHERE pdf_id = $1`, pdfID)
+	rows, err := db.Pool.Query(ctx, `
+		WITH topic_input AS (
+			SELECT DISTINCT unnest($1::text[]) AS name
+		), subtopic_input AS (
+			SELECT DISTINCT unnest($2::text[]) AS name
+		), tag_input AS (
+			SELECT DISTINCT unnest($3::text[]) AS name
+		), new_topics AS (
+			INSERT INTO topics (name)
+			SELECT i.name FROM topic_input i
+			WHERE NOT EXISTS (SELECT 1 FROM topics x WHERE x.name = i.name)
+			RETURNING id, name
+		), new_subtopics AS (
+			INSERT INTO subtopics (name)
+			SELECT i.name FROM subtopic_input i
+			WHERE NOT EXISTS (SELECT 1 FROM subtopics x WHERE x.name = i.name)
+			RETURNING id, name
+		), new_tags AS (
+			INSERT INTO tags (name)
+			SELECT i.name FROM tag_input i
+			WHERE NOT EXISTS (SELECT 1 FROM tags x WHERE x.name = i.name)
+			RETURNING id, name
+		)
+		SELECT 'topic' AS kind, id, name FROM new_topics
+		UNION ALL
+		SELECT 'topic', x.id, x.name FROM topics x JOIN topic_input i ON x.name = i.name
+		UNION ALL
+		SELECT 'subtopic', id, name FROM new_subtopics
+		UNION ALL
+		SELECT 'subtopic', x.id, x.name FROM subtopics x JOIN subtopic_input i ON x.name = i.name
+		UNION ALL
+		SELECT 'tag', id, name FROM new_tags
+		UNION ALL
+		SELECT 'tag', x.id, x.name FROM tags x JOIN tag_input i ON x.name = i.name
+	`, topicNames, subtopicNames, tagNames)
 	if err != nil {
-		return err
+		return nil, nil, nil, err
 	}
+	defer rows.Close()
 
-	// Insert new tags with count=1
-	for _, tagID := range tagIDs {
-		_, err = tx.Exec(ctx, `INSERT INTO pdf_tags (pdf_id, tag_id, count) VALUES ($1, $2, 1)`, pdfID, tagID)
-		if err != nil {
-			return err
+	topicsByName := make(map[string]int, len(topicNames))
+	subtopicsByName := make(map[string]int, len(subtopicNames))
+	tagsByName := make(map[string]int, len(tagNames))
+	for rows.Next() {
+		var kind, name string
+		var id int
+		if err := rows.Scan(&kind, &id, &name); err != nil {
+			return nil, nil, nil, err
+		}
+		var idsByName map[string]int
+		switch kind {
+		case "topic":
+			idsByName = topicsByName
+		case "subtopic":
+			idsByName = subtopicsByName
+		case "tag":
+			idsByName = tagsByName
+		}
+		if _, ok := idsByName[name]; !ok {
+			idsByName[name] = id
 		}
 	}
-
-	return tx.Commit(ctx)
-}
-
-// GetOrCreateTopic gets a topic by name or creates it if it doesn't exist
-func GetOrCreateTopic(ctx context.Context, name string) (int, error) {
-	var id int
-	err := db.Pool.QueryRow(ctx, `SELECT id FROM topics WHERE name = $1`, name).Scan(&id)
-	if err == nil {
-		return id, nil
-	}
-	if err != pgx.ErrNoRows {
-		return 0, err
-	}
-
-	// Create new topic
-	err = db.Pool.QueryRow(ctx, `INSERT INTO topics (name) VALUES ($1) RETURNING id`, name).Scan(&id)
-	return id, err
-}
-
-// GetOrCreateSubtopic gets a subtopic by name or creates it if it doesn't exist
-func GetOrCreateSubtopic(ctx context.Context, name string) (int, error) {
-	var id int
-	err := db.Pool.QueryRow(ctx, `SELECT id FROM subtopics WHERE name = $1`, name).Scan(&id)
-	if err == nil {
-		return id, nil
-	}
-	if err != pgx.ErrNoRows {
-		return 0, err
+	if err := rows.Err(); err != nil {
+		return nil, nil, nil, err
 	}
 
-	// Create new subtopic
-	err = db.Pool.QueryRow(ctx, `INSERT INTO subtopics (name) VALUES ($1) RETURNING id`, name).Scan(&id)
-	return id, err
+	return idsInOrder(topicNames, topicsByName),
+		idsInOrder(subtopicNames, subtopicsByName),
+		idsInOrder(tagNames, tagsByName), nil
 }
 
-// GetOrCreateTag gets a tag by name or creates it if it doesn't exist
-func GetOrCreateTag(ctx context.Context, name string) (int, error) {
-	var id int
-	err := db.Pool.QueryRow(ctx, `SELECT id FROM tags WHERE name = $1`, name).Scan(&id)
-	if err == nil {
-		return id, nil
-	}
-	if err != pgx.ErrNoRows {
-		return 0, err
+// idsInOrder maps names to their resolved ids, keeping the order the names
+// were given and skipping any that weren't resolved.
+func idsInOrder(names []string, idsByName map[string]int) []int {
+	ids := make([]int, 0, len(names))
+	for _, name := range names {
+		if id, ok := idsByName[name]; ok {
+			ids = append(ids, id)
+		}
 	}
-
-	// Create new tag
-	err = db.Pool.QueryRow(ctx, `INSERT INTO tags (name) VALUES ($1) RETURNING id`, name).Scan(&id)
-	return id, err
+	return ids
 }
 
 // RestorePDF marks a soft-deleted PDF as active again
 func RestorePDF(ctx context.Context, pdfID int) error {
 	_, err := db.Pool.Exec(ctx, `UPDATE pdfs SET is_active = true WHERE id = $1`, pdfID)
+	invalidateQuestionPDFCache()
 	return err
 }
 
@@ -517,7 +606,83 @@ func GetPDFTags(ctx context.Context, pdfID int) ([]int, error) {
 	return ids, rows.Err()
 }
 
+// questionPDFCacheTTL bounds how long PDF matches for a question are reused.
+// Changes to PDFs clear the cache outright; the TTL covers edits to the
+// question's own topics and tags.
+const (
+	questionPDFCacheTTL  = 5 * time.Minute
+	questionPDFCacheSize = 10000
+)
+
+type questionPDFKey struct {
+	questionID string
+	maxPDFs    int
+}
+
+type cachedQuestionPDFs struct {
+	pdfs    []PDF
+	expires time.Time
+}
+
+var (
+	questionPDFCache   = make(map[questionPDFKey]cachedQuestionPDFs)
+	questionPDFCacheMu sync.RWMutex
+
+	// questionPDFGen is bumped by invalidateQuestionPDFCache. Loads started
+	// under an older generation don't store their result.
+	questionPDFGen uint64
+)
+
+func invalidateQuestionPDFCache() {
+	questionPDFCacheMu.Lock()
+	questionPDFCache = make(map[questionPDFKey]cachedQuestionPDFs)
+	questionPDFGen++
+	questionPDFCacheMu.Unlock()
+}
+
+func storeQuestionPDFs(key questionPDFKey, pdfs []PDF, gen uint64) {
+	questionPDFCacheMu.Lock()
+	defer questionPDFCacheMu.Unlock()
+
+	if questionPDFGen != gen {
+		return
+	}
+
+	if len(questionPDFCache) >= questionPDFCacheSize {
+		now := time.Now()
+		for k, v := range questionPDFCache {
+			if now.After(v.expires) {
+				delete(questionPDFCache, k)
+			}
+		}
+		if len(questionPDFCache) >= questionPDFCacheSize {
+			questionPDFCache = make(map[questionPDFKey]cachedQuestionPDFs)
+		}
+	}
+	questionPDFCache[key] = cachedQuestionPDFs{pdfs: pdfs, expires: time.Now().Add(questionPDFCacheTTL)}
+}
+
+// GetPDFsForQuestion returns the best matching PDFs for a question, served
+// from a short-lived cache. Callers must not modify the returned slice.
 func GetPDFsForQuestion(ctx context.Context, questionID string, maxPDFs int) ([]PDF, error) {
+	key := questionPDFKey{questionID: questionID, maxPDFs: maxPDFs}
+	questionPDFCacheMu.RLock()
+	cached, ok := questionPDFCache[key]
+	gen := questionPDFGen
+	questionPDFCacheMu.RUnlock()
+	if ok && time.Now().Before(cached.expires) {
+		return cached.pdfs, nil
+	}
+
+	pdfs, err := loadPDFsForQuestion(ctx, questionID, maxPDFs)
+	if err != nil {
+		return nil, err
+	}
+	storeQuestionPDFs(key, pdfs, gen)
+	return pdfs, nil
+}
+
+func loadPDFsForQuestion(ctx context.Context, questionID string, maxPDFs int) ([]PDF, error) {
 	// Use the RPC function get_pdfs_for_question_v3 for accurate weighted scoring
 	// This matches the Flask implementation exactly:
 	// - Topic: 30% weight
@@ -540,14 +705,12 @@ func GetPDFsForQuestion(ctx context.Context, questionID string, maxPDFs int) ([]
 	}
 	defer rows.Close()
 
-	var pdfs []PDF
+	pdfs := make([]PDF, 0, maxPDFs)
 	for rows.Next() {
 		var p PDF
-		var matchReasons []string
-		if err := rows.Scan(&p.ID, &p.StoragePath, &p.OriginalFilename, &p.ModuleName, &p.MatchPercent, &matchReasons); err != nil {
+		if err := rows.Scan(&p.ID, &p.StoragePath, &p.OriginalFilename, &p.ModuleName, &p.MatchPercent, &p.MatchReasons); err != nil {
 			return nil, err
 		}
-		p.MatchReasons = matchReasons
 		p.MimeType = "application/pdf"
 		p.IsActive = true
 		p.URL = "/api/pdf/" + strconv.Itoa(p.ID)
@@ -556,6 +719,22 @@ func GetPDFsForQuestion(ctx context.Context, questionID string, maxPDFs int) ([]
 	return pdfs, rows.Err()
 }
 
+// GetServablePDF loads only the columns needed to stream a PDF, without the
+// module join GetPDFByID does. A covering index on pdfs lets this be answered
+// from the index alone.
+func GetServablePDF(ctx context.Context, pdfID int) (*PDF, error) {
+	p := PDF{ID: pdfID}
+	err := db.Pool.QueryRow(ctx, `
+		SELECT storage_path, original_filename, mime_type, is_active
+		FROM pdfs
+		WHERE id = $1
+	`, pdfID).Scan(&p.StoragePath, &p.OriginalFilename, &p.MimeType, &p.IsActive)
+	if err != nil {
+		return nil, err
+	}
+	return &p, nil
+}
+
 func GetPDFByID(ctx context.Context, pdfID int) (*PDF, error) {
 	var p PDF
 	err := db.Pool.QueryRow(ctx, `
@@ -648,7 +827,7 @@ func ListPDFs(ctx context.Context, params ListPDFsParams) ([]PDF, int, error) {
 	}
 
 	countArgs := append([]interface{}{}, args...)
-	countQuery := `SELECT COUNT(DISTINCT p.id) FROM pdfs p ` + whereClause
+	countQuery := `SELECT COUNT(*) FROM pdfs p ` + whereClause
 	var total int
 	if err := db.Pool.QueryRow(ctx, countQuery, countArgs...).Scan(&total); err != nil {
 		return nil, 0, err
@@ -658,22 +837,18 @@ func ListPDFs(ctx context.Context, params ListPDFsParams) ([]PDF, int, error) {
 	offsetArg := strconv.Itoa(argN + 1)
 	args = append(args, params.Limit, params.Offset)
 
+	// Label names come from per-row subqueries rather than joining all three
+	// link tables, which multiplied topics x subtopics x tags for every PDF
+	// before grouping, and only run for the page that is returned.
 	query := `
 		SELECT p.id, p.storage_path, p.original_filename, p.file_size,
 		       p.mime_type, p.module_id, COALESCE(m.name, ''), p.is_active,
-		       COALESCE(ARRAY_AGG(DISTINCT t.name) FILTER (WHERE t.name IS NOT NULL), '{}'),
-		       COALESCE(ARRAY_AGG(DISTINCT st.name) FILTER (WHERE st.name IS NOT NULL), '{}'),
-		       COALESCE(ARRAY_AGG(DISTINCT tg.name) FILTER (WHERE tg.name IS NOT NULL), '{}')
+		       ARRAY(SELECT DISTINCT t.name FROM pdf_topics pt JOIN topics t ON pt.topic_id = t.id WHERE pt.pdf_id = p.id ORDER BY t.name),
+		       ARRAY(SELECT DISTINCT st.name FROM pdf_subtopics ps JOIN subtopics st ON ps.subtopic_id = st.id WHERE ps.pdf_id = p.id ORDER BY st.name),
+		       ARRAY(SELECT DISTINCT tg.name FROM pdf_tags ptg JOIN tags tg ON ptg.tag_id = tg.id WHERE ptg.pdf_id = p.id ORDER BY tg.name)
 		FROM pdfs p
 		LEFT JOIN modules m ON p.module_id = m.id
-		LEFT JOIN pdf_topics pt ON p.id = pt.pdf_id
-		LEFT JOIN topics t ON pt.topic_id = t.id
-		LEFT JOIN pdf_subtopics ps ON p.id = ps.pdf_id
-		LEFT JOIN subtopics st ON ps.subtopic_id = st.id
-		LEFT JOIN pdf_tags ptg ON p.id = ptg.pdf_id
-		LEFT JOIN tags tg ON ptg.tag_id = tg.id
 		` + whereClause + `
-		GROUP BY p.id, m.name
 		ORDER BY p.created_at DESC
 		LIMIT $` + limitArg + ` OFFSET $` + offsetArg
 
@@ -705,11 +880,13 @@ func ListPDFs(ctx context.Context, params ListPDFsParams) ([]PDF, int, error) {
 
 func SoftDeletePDF(ctx context.Context, pdfID int) error {
 	_, err := db.Pool.Exec(ctx, `UPDATE pdfs SET is_active = false WHERE id = $1`, pdfID)
+	invalidateQuestionPDFCache()
 	return err
 }
 
 func HardDeletePDF(ctx context.Context, pdfID int) (string, error) {
 	var storagePath string
 	err := db.Pool.QueryRow(ctx, `DELETE FROM pdfs WHERE id = $1 RETURNING storage_path`, pdfID).Scan(&storagePath)
+	invalidateQuestionPDFCache()
 	return storagePath, err
 }
@@ -25,176 +25,89 @@ type Distractor struct {
 	Metadata *int   `json:"metadata,omitempty"`
 }
 
-func GetRandomQuestion(ctx context.Context, moduleID int, topics, subtopics, tags []string, specificQuestionID string) (*Question, error) {
-	query := `
-		WITH filtered_questions AS (
-			SELECT DISTINCT q.id, q.question, q.answer, q.module_id
+// Hot-path statements are kept as fixed package-level text so pgx's
+// per-connection statement cache, which is keyed by SQL text, prepares each
+// one once per connection and reuses it.
+const (
+	// randomQuestionSQL picks one matching question and returns it with up to
+	// $7 non-blank manual distractors, so the question page needs a single
+	// round trip. Topic/subtopic/tag names come from the module answer pool.
+	randomQuestionSQL = `
+		WITH picked AS (
+			SELECT q.id, q.question, q.answer, q.module_id
 			FROM questions q
-			LEFT JOIN question_topics qt ON q.id = qt.question_id
-			LEFT JOIN topics t ON qt.topic_id = t.id
-			LEFT JOIN question_subtopics qst ON q.id = qst.question_id
-			LEFT JOIN subtopics st ON qst.subtopic_id = st.id
-			LEFT JOIN question_tags qtag ON q.id = qtag.question_id
-			LEFT JOIN tags tag ON qtag.tag_id = tag.id
 			WHERE q.module_id = $1
 			  AND ($2::text IS NULL OR q.id = $2)
-			  AND ($3::text[] IS NULL OR array_length($3::text[], 1) IS NULL OR t.name = ANY($3))
-			  AND ($4::text[] IS NULL OR array_length($4::text[], 1) IS NULL OR st.name = ANY($4))
-			  AND ($5::text[] IS NULL OR array_length($5::text[], 1) IS NULL OR tag.name = ANY($5))
+			  AND ($3::text[] IS NULL OR array_length($3::text[], 1) IS NULL OR q.id IN (
+				SELECT qt.question_id FROM question_topics qt
+				JOIN topics t ON qt.topic_id = t.id
+				WHERE t.name = ANY($3)))
+			  AND ($4::text[] IS NULL OR array_length($4::text[], 1) IS NULL OR q.id IN (
+				SELECT qst.question_id FROM question_subtopics qst
+				JOIN subtopics st ON qst.subtopic_id = st.id
+				WHERE st.name = ANY($4)))
+			  AND ($5::text[] IS NULL OR array_length($5::text[], 1) IS NULL OR q.id IN (
+				SELECT qtag.question_id FROM question_tags qtag
+				JOIN tags tag ON qtag.tag_id = tag.id
+				WHERE tag.name = ANY($5)))
+			  AND ($6::text[] IS NULL OR array_length($6::text[], 1) IS NULL OR q.id != ALL($6))
+			ORDER BY random()
+			LIMIT 1
 		)
-		SELECT id, question, answer, module_id
-		FROM filtered_questions
-		ORDER BY random()
-		LIMIT 1
+		SELECT p.id, p.question, p.answer, p.module_id,
+			ARRAY(
+				SELECT md.id FROM manual_distractors md
+				WHERE md.question_id = p.id AND trim(md.distractor_text) != ''
+				ORDER BY md.id LIMIT $7
+			),
+			ARRAY(
+				SELECT md.distractor_text FROM manual_distractors md
+				WHERE md.question_id = p.id AND trim(md.distractor_text) != ''
+				ORDER BY md.id LIMIT $7
+			)
+		FROM picked p
 	`
 
-	var specificID *string
-	if specificQuestionID != "" {
-		specificID = &specificQuestionID
-	}
-
-	var topicsParam, subtopicsParam, tagsParam interface{}
-	if len(topics) > 0 {
-		topicsParam = topics
-	}
-	if len(subtopics) > 0 {
-		subtopicsParam = subtopics
-	}
-	if len(tags) > 0 {
-		tagsParam = tags
-	}
-
-	var q Question
-	err := db.Pool.QueryRow(ctx, query, moduleID, specificID, topicsParam, subtopicsParam, tagsParam).
-		Scan(&q.ID, &q.Question, &q.Answer, &q.ModuleID)
-	if err == pgx.ErrNoRows {
-		return nil, nil
-	}
-	if err != nil {
-		return nil, err
-	}
-
-	q.Topics, q.Subtopics, q.Tags, err = GetQuestionMetadata(ctx, q.ID)
-	if err != nil {
-		return nil, err
-	}
+	// questionMetadataColumns selects the sorted topic, subtopic and tag names
+	// of the question aliased as p. It matches the names the answer pool keeps.
+	questionMetadataColumns = `
+			ARRAY(SELECT t.name FROM question_topics qt JOIN topics t ON qt.topic_id = t.id WHERE qt.question_id = p.id ORDER BY t.name),
+			ARRAY(SELECT st.name FROM question_subtopics qst JOIN subtopics st ON qst.subtopic_id = st.id WHERE qst.question_id = p.id ORDER BY st.name),
+			ARRAY(SELECT tag.name FROM question_tags qtag JOIN tags tag ON qtag.tag_id = tag.id WHERE qtag.question_id = p.id ORDER BY tag.name)`
 
-	return &q, nil
-}
+	questionAnswerSQL = `SELECT answer, module_id FROM questions WHERE id = $1`
+)
 
 func GetQuestionMetadata(ctx context.Context, questionID string) (topics, subtopics, tags []string, err error) {
-	topicsQuery := `
-		SELECT t.name FROM topics t
-		JOIN question_topics qt ON t.id = qt.topic_id
-		WHERE qt.question_id = $1
-		ORDER BY t.name
-	`
-	rows, err := db.Pool.Query(ctx, topicsQuery, questionID)
-	if err != nil {
-		return nil, nil, nil, err
-	}
-	for rows.Next() {
-		var name string
-		if err := rows.Scan(&name); err != nil {
-			rows.Close()
-			return nil, nil, nil, err
-		}
-		topics = append(topics, name)
-	}
-	rows.Close()
-
-	subtopicsQuery := `
-		SELECT st.name FROM subtopics st
-		JOIN question_subtopics qst ON st.id = qst.subtopic_id
-		WHERE qst.question_id = $1
-		ORDER BY st.name
-	`
-	rows, err = db.Pool.Query(ctx, subtopicsQuery, questionID)
-	if err != nil {
-		return nil, nil, nil, err
-	}
-	for rows.Next() {
-		var name string
-		if err := rows.Scan(&name); err != nil {
-			rows.Close()
-			return nil, nil, nil, err
-		}
-		subtopics = append(subtopics, name)
-	}
-	rows.Close()
-
-	tagsQuery := `
-		SELECT tag.name FROM tags tag
-		JOIN question_tags qtag ON tag.id = qtag.tag_id
-		WHERE qtag.question_id = $1
-		ORDER BY tag.name
-	`
-	rows, err = db.Pool.Query(ctx, tagsQuery, questionID)
-	if err != nil {
-		return nil, nil, nil, err
-	}
-	for rows.Next() {
-		var name string
-		if err := rows.Scan(&name); err != nil {
-			rows.Close()
-			return nil, nil, nil, err
-		}
-		tags = append(tags, name)
-	}
-	rows.Close()
+	err = db.Pool.QueryRow(ctx, `SELECT `+questionMetadataColumns+` FROM (SELECT $1::text AS id) p`, questionID).
+		Scan(&topics, &subtopics, &tags)
+	return topics, subtopics, tags, err
+}
 
-	return topics, subtopics, tags, nil
+// QuestionExists reports whether a question with the given id exists without
+// reading the row.
+func QuestionExists(ctx context.Context, questionID string) (bool, error) {
+	var exists bool
+	err := db.Pool.QueryRow(ctx, `SELECT EXISTS(SELECT 1 FROM questions WHERE id = $1)`, questionID).Scan(&exists)
+	return exists, err
 }
 
-func GetQuestionByID(ctx context.Context, questionID string) (*Question, error) {
-	var q Question
-	err := db.Pool.QueryRow(ctx, `
-		SELECT id, question, answer, module_id
-		FROM questions
-		WHERE id = $1
-	`, questionID).Scan(&q.ID, &q.Question, &q.Answer, &q.ModuleID)
+// GetQuestionAnswer returns only what grading needs: the stored answer and the
+// question's module. ok is false when the question does not exist.
+func GetQuestionAnswer(ctx context.Context, questionID string) (answer string, moduleID int, ok bool, err error) {
+	err = db.Pool.QueryRow(ctx, questionAnswerSQL, questionID).Scan(&answer, &moduleID)
 	if err == pgx.ErrNoRows {
-		return nil, nil
+		return "", 0, false, nil
 	}
 	if err != nil {
-		return nil, err
+		return "", 0, false, err
 	}
-	return &q, nil
+	return answer, moduleID, true, nil
 }
 
-func GetModuleNameByID(ctx context.Context, moduleID int) (string, error) {
-	var name string
-	err := db.Pool.QueryRow(ctx, `SELECT name FROM modules WHERE id = $1`, moduleID).Scan(&name)
-	if err == pgx.ErrNoRows {
-		return "", nil
-	}
-	return name, err
-}
-
-func GetRandomQuestionExcluding(ctx context.Context, moduleID int, topics, subtopics, tags []string, specificQuestionID string, excludeIDs []string) (*Question, error) {
-	query := `
-		WITH filtered_questions AS (
-			SELECT DISTINCT q.id, q.question, q.answer, q.module_id
-			FROM questions q
-			LEFT JOIN question_topics qt ON q.id = qt.question_id
-			LEFT JOIN topics t ON qt.topic_id = t.id
-			LEFT JOIN question_subtopics qst ON q.id = qst.question_id
-			LEFT JOIN subtopics st ON qst.subtopic_id = st.id
-			LEFT JOIN question_tags qtag ON q.id = qtag.question_id
-			LEFT JOIN tags tag ON qtag.tag_id = tag.id
-			WHERE q.module_id = $1
-			  AND ($2::text IS NULL OR q.id = $2)
-			  AND ($3::text[] IS NULL OR array_length($3::text[], 1) IS NULL OR t.name = ANY($3))
-			  AND ($4::text[] IS NULL OR array_length($4::text[], 1) IS NULL OR st.name = ANY($4))
-			  AND ($5::text[] IS NULL OR array_length($5::text[], 1) IS NULL OR tag.name = ANY($5))
-			  AND ($6::text[] IS NULL OR array_length($6::text[], 1) IS NULL OR q.id != ALL($6))
-		)
-		SELECT id, question, answer, module_id
-		FROM filtered_questions
-		ORDER BY random()
-		LIMIT 1
-	`
-
+// GetRandomQuestionWithDistractors returns a random matching question with its
+// metadata and up to manualLimit of its manual distractors in one query.
+func GetRandomQuestionWithDistractors(ctx context.Context, moduleID int, topics, subtopics, tags []string, specificQuestionID string, excludeIDs []string, manualLimit int) (*Question, []Distractor, error) {
 	var specificID *string
 	if specificQuestionID != "" {
 		specificID = &specificQuestionID
@@ -215,19 +128,26 @@ func GetRandomQuestionExcluding(ctx context.Context, moduleID int, topics, subto
 	}
 
 	var q Question
-	err := db.Pool.QueryRow(ctx, query, moduleID, specificID, topicsParam, subtopicsParam, tagsParam, excludeParam).
-		Scan(&q.ID, &q.Question, &q.Answer, &q.ModuleID)
+	var manualIDs []int
+	var manualTexts []string
+	err := db.Pool.QueryRow(ctx, randomQuestionSQL, moduleID, specificID, topicsParam, subtopicsParam, tagsParam, excludeParam, manualLimit).
+		Scan(&q.ID, &q.Question, &q.Answer, &q.ModuleID, &manualIDs, &manualTexts)
 	if err == pgx.ErrNoRows {
-		return nil, nil
+		return nil, nil, nil
 	}
 	if err != nil {
-		return nil, err
+		return nil, nil, err
 	}
 
-	q.Topics, q.Subtopics, q.Tags, err = GetQuestionMetadata(ctx, q.ID)
+	q.Topics, q.Subtopics, q.Tags, err = GetPooledQuestionMetadata(ctx, moduleID, q.ID)
 	if err != nil {
-		return nil, err
+		return nil, nil, err
+	}
+
+	manual := make([]Distractor, len(manualIDs))
+	for i := range manualIDs {
+		manual[i] = Distractor{Answer: manualTexts[i], Type: "manual_distractor", Metadata: &manualIDs[i]}
 	}
 
-	return &q, nil
+	return &q, manual, nil
 }
@@ -2,6 +2,7 @@ package queries
 
 import (
 	"context"
+	"sync"
 	"time"
 
 	"flashcards-go/internal/db"
@@ -51,25 +52,40 @@ func GetUserStats(ctx context.Context, userID string) (*UserStats, error) {
 	return &stats, nil
 }
 
+// GetOrCreateUserStats inserts a zeroed stats row if none exists and returns
+// the user's stats in a single round trip.
 func GetOrCreateUserStats(ctx context.Context, userID, username string) (*UserStats, error) {
-	stats, err := GetUserStats(ctx, userID)
-	if err != nil {
-		return nil, err
-	}
-	if stats != nil {
-		return stats, nil
+	var stats UserStats
+	err := db.Pool.QueryRow(ctx, `
+		WITH inserted AS (
+			INSERT INTO user_stats (user_id, username, correct_answers, total_answers, current_streak, max_streak, approved_cards)
+			VALUES ($1, $2, 0, 0, 0, 0, 0)
+			ON CONFLICT (user_id) DO NOTHING
+			RETURNING user_id, username, correct_answers, total_answers,
+			          current_streak, max_streak, approved_cards, last_answer_time
+		)
+		SELECT user_id, username, correct_answers, total_answers,
+		       current_streak, COALESCE(max_streak, 0), approved_cards, last_answer_time
+		FROM inserted
+		UNION ALL
+		SELECT user_id, username, correct_answers, total_answers,
+		       current_streak, COALESCE(max_streak, 0), approved_cards, last_answer_time
+		FROM user_stats
+		WHERE user_id = $1 AND NOT EXISTS (SELECT 1 FROM inserted)
+	`, userID, username).Scan(
+		&stats.UserID, &stats.Username, &stats.CorrectAnswers,
+		&stats.TotalAnswers, &stats.CurrentStreak, &stats.MaxStreak, &stats.ApprovedCards,
+		&stats.LastAnswerTime,
+	)
+	if err == pgx.ErrNoRows {
+		// A concurrent request inserted the row after this statement's
+		// snapshot was taken, so neither branch saw it; it is visible now.
+		return GetUserStats(ctx, userID)
 	}
-
-	_, err = db.Pool.Exec(ctx, `
-		INSERT INTO user_stats (user_id, username, correct_answers, total_answers, current_streak, max_streak, approved_cards)
-		VALUES ($1, $2, 0, 0, 0, 0, 0)
-		ON CONFLICT (user_id) DO NOTHING
-	`, userID, username)
 	if err != nil {
 		return nil, err
 	}
-
-	return GetUserStats(ctx, userID)
+	return &stats, nil
 }
 
 func GetUserModuleStats(ctx context.Context, userID string) ([]ModuleStats, error) {
@@ -109,39 +125,38 @@ type LeaderboardEntry struct {
 	LastAnswerTime *time.Time `json:"last_answer_time,omitempty"`
 }
 
-func GetLeaderboard(ctx context.Context, sortBy, order string, moduleID *int, limit int) ([]LeaderboardEntry, error) {
-	// Map sort field names to SQL expressions
-	sortExpressions := map[string]string{
-		"correct_answers": "correct_answers",
-		"total_answers":   "total_answers",
-		"current_streak":  "current_streak",
-		"max_streak":      "max_streak",
-		"approved_cards":  "approved_cards",
-		"accuracy":        "(CASE WHEN total_answers > 0 THEN correct_answers::float / total_answers ELSE 0 END)",
-		"last_answer_time": "last_answer_time",
-	}
-	sortExpr, valid := sortExpressions[sortBy]
-	if !valid {
-		sortExpr = "correct_answers"
-	}
-	if order != "asc" && order != "desc" {
-		order = "desc"
-	}
+// leaderboardSortExpressions maps the accepted sort field names to SQL
+// expressions.
+var leaderboardSortExpressions = map[string]string{
+	"correct_answers":  "correct_answers",
+	"total_answers":    "total_answers",
+	"current_streak":   "current_streak",
+	"max_streak":       "max_streak",
+	"approved_cards":   "approved_cards",
+	"accuracy":         "(CASE WHEN total_answers > 0 THEN correct_answers::float / total_answers ELSE 0 END)",
+	"last_answer_time": "last_answer_time",
+}
 
-	var query string
-	var args []interface{}
+type leaderboardQueryKey struct {
+	sortBy   string
+	order    string
+	byModule bool
+}
 
-	nullsClause := ""
-	if sortBy == "last_answer_time" {
-		if order == "desc" {
-			nullsClause = " NULLS LAST"
-		} else {
+// leaderboardQueries holds every leaderboard query variant, built once so a
+// request only looks its SQL up.
+var leaderboardQueries = buildLeaderboardQueries()
+
+func buildLeaderboardQueries() map[leaderboardQueryKey]string {
+	built := make(map[leaderboardQueryKey]string)
+	for sortBy, sortExpr := range leaderboardSortExpressions {
+		nullsClause := ""
+		if sortBy == "last_answer_time" {
 			nullsClause = " NULLS LAST"
 		}
-	}
-
-	if moduleID != nil {
-		query = `
+		for _, order := range []string{"asc", "desc"} {
+			orderBy := sortExpr + ` ` + order + nullsClause
+			built[leaderboardQueryKey{sortBy, order, true}] = `
 			SELECT us.user_id, us.username,
 			       COALESCE(ms.number_correct, 0) as correct_answers,
 			       COALESCE(ms.number_answered, 0) as total_answers,
@@ -152,38 +167,71 @@ func GetLeaderboard(ctx context.Context, sortBy, order string, moduleID *int, li
 			FROM user_stats us
 			LEFT JOIN module_stats ms ON us.user_id = ms.user_id AND ms.module_id = $1
 			WHERE ms.number_answered > 0
-			ORDER BY ` + sortExpr + ` ` + order + nullsClause + `
+			ORDER BY ` + orderBy + `
 			LIMIT $2
 		`
-		args = []interface{}{*moduleID, limit}
-	} else {
-		query = `
+			built[leaderboardQueryKey{sortBy, order, false}] = `
 			SELECT user_id, username, correct_answers, total_answers,
 			       current_streak, COALESCE(max_streak, 0), approved_cards, last_answer_time
 			FROM user_stats
 			WHERE total_answers > 0
-			ORDER BY ` + sortExpr + ` ` + order + nullsClause + `
+			ORDER BY ` + orderBy + `
 			LIMIT $1
 		`
+		}
+	}
+	return built
+}
+
+func GetLeaderboard(ctx context.Context, sortBy, order string, moduleID *int, limit int) ([]LeaderboardEntry, error) {
+	var entries []LeaderboardEntry
+	err := EachLeaderboardEntry(ctx, sortBy, order, moduleID, limit, func(e *LeaderboardEntry) error {
+		entries = append(entries, *e)
+		return nil
+	})
+	if err != nil {
+		return nil, err
+	}
+	return entries, nil
+}
+
+// EachLeaderboardEntry streams leaderboard rows to fn in rank order without
+// collecting them, stopping at the first error fn returns. The entry passed to
+// fn is reused between calls.
+func EachLeaderboardEntry(ctx context.Context, sortBy, order string, moduleID *int, limit int, fn func(*LeaderboardEntry) error) error {
+	if _, valid := leaderboardSortExpressions[sortBy]; !valid {
+		sortBy = "correct_answers"
+	}
+	if order != "asc" && order != "desc" {
+		order = "desc"
+	}
+
+	query := leaderboardQueries[leaderboardQueryKey{sortBy, order, moduleID != nil}]
+	var args []interface{}
+	if moduleID != nil {
+		args = []interface{}{*moduleID, limit}
+	} else {
 		args = []interface{}{limit}
 	}
 
 	rows, err := db.Pool.Query(ctx, query, args...)
 	if err != nil {
-		return nil, err
+		return err
 	}
 	defer rows.Close()
 
-	var entries []LeaderboardEntry
+	var e LeaderboardEntry
 	for rows.Next() {
-		var e LeaderboardEntry
+		e = LeaderboardEntry{}
 		if err := rows.Scan(&e.UserID, &e.Username, &e.CorrectAnswers,
 			&e.TotalAnswers, &e.CurrentStreak, &e.MaxStreak, &e.ApprovedCards, &e.LastAnswerTime); err != nil {
-			return nil, err
+			return err
+		}
+		if err := fn(&e); err != nil {
+			return err
 		}
-		entries = append(entries, e)
 	}
-	return entries, rows.Err()
+	return rows.Err()
 }
 
 type LeaderboardTotals struct {
@@ -229,20 +277,13 @@ func GetUserRank(ctx context.Context, userID string) (int, int, error) {
 	return rank, totalUsers, nil
 }
 
-func IsTokenUsed(ctx context.Context, userID, token string) (bool, error) {
-	var exists bool
-	err := db.Pool.QueryRow(ctx, `
-		SELECT EXISTS(SELECT 1 FROM used_tokens WHERE user_id = $1 AND token = $2)
-	`, userID, token).Scan(&exists)
-	return exists, err
-}
-
-func MarkTokenUsed(ctx context.Context, userID, token string) error {
-	_, err := db.Pool.Exec(ctx, `
-		INSERT INTO used_tokens (user_id, token) VALUES ($1, $2)
-	`, userID, token)
-	return err
-}
+// claimTokenSQL returns a row only if the token had not been used yet. It
+// relies on the unique (user_id, token) index on used_tokens.
+const claimTokenSQL = `
+	INSERT INTO used_tokens (user_id, token) VALUES ($1, $2)
+	ON CONFLICT DO NOTHING
+	RETURNING 1
+`
 
 func ResetUserStreak(ctx context.Context, userID string, moduleID int) error {
 	// Reset global streak
@@ -261,47 +302,39 @@ func ResetUserStreak(ctx context.Context, userID string, moduleID int) error {
 }
 
 type AnswerResult struct {
-	Correct       bool `json:"correct"`
-	NewStreak     int  `json:"new_streak"`
-	MaxStreak     int  `json:"max_streak"`
-	TotalCorrect  int  `json:"total_correct"`
-	TotalAnswers  int  `json:"total_answers"`
-	ModuleStreak  int  `json:"module_streak"`
-	ModuleCorrect int  `json:"module_correct"`
-	ModuleAnswers int  `json:"module_answers"`
+	Correct       bool      `json:"correct"`
+	NewStreak     int       `json:"new_streak"`
+	MaxStreak     int       `json:"max_streak"`
+	TotalCorrect  int       `json:"total_correct"`
+	TotalAnswers  int       `json:"total_answers"`
+	ModuleStreak  int       `json:"module_streak"`
+	ModuleCorrect int       `json:"module_correct"`
+	ModuleAnswers int       `json:"module_answers"`
+	ModuleName    string    `json:"module_name"`
+	AnsweredAt    time.Time `json:"answered_at"`
 }
 
-func ProcessAnswerCheck(ctx context.Context, userID, questionID, submittedAnswer, token, username string) (*AnswerResult, string, error) {
+// RecordCorrectAnswer records an answer the caller has already graded as
+// correct against the question's stored answer and module, so the question is
+// not read again. Wrong answers only reset streaks, via ResetUserStreak.
+func RecordCorrectAnswer(ctx context.Context, userID, questionID string, moduleID int, token, username string) (*AnswerResult, string, error) {
 	tx, err := db.Pool.Begin(ctx)
 	if err != nil {
 		return nil, "", err
 	}
 	defer tx.Rollback(ctx)
 
-	var tokenUsed bool
-	err = tx.QueryRow(ctx, `
-		SELECT EXISTS(SELECT 1 FROM used_tokens WHERE user_id = $1 AND token = $2)
-	`, userID, token).Scan(&tokenUsed)
-	if err != nil {
-		return nil, "", err
-	}
-	if tokenUsed {
-		return nil, "Token already used", nil
-	}
-
-	var correctAnswer string
-	var moduleID int
-	err = tx.QueryRow(ctx, `
-		SELECT answer, module_id FROM questions WHERE id = $1
-	`, questionID).Scan(&correctAnswer, &moduleID)
+	// Claim the token in the same statement that checks it; RETURNING yields
+	// no row when (user_id, token) already exists.
+	var claimed int
+	err = tx.QueryRow(ctx, claimTokenSQL, userID, token).Scan(&claimed)
 	if err == pgx.ErrNoRows {
-		return nil, "Question not found", nil
+		return nil, "Token already used", nil
 	}
 	if err != nil {
 		return nil, "", err
 	}
 
-	isCorrect := submittedAnswer == correctAnswer
 	now := time.Now()
 
 	var currentCorrect, currentTotal, currentStreak, currentMaxStreak int
@@ -315,13 +348,9 @@ func ProcessAnswerCheck(ctx context.Context, userID, questionID, submittedAnswer
 		return nil, "", err
 	}
 
-	newCorrect := currentCorrect
+	newCorrect := currentCorrect + 1
 	newTotal := currentTotal + 1
-	newStreak := 0
-	if isCorrect {
-		newCorrect++
-		newStreak = currentStreak + 1
-	}
+	newStreak := currentStreak + 1
 	newMaxStreak := currentMaxStreak
 	if newStreak > newMaxStreak {
 		newMaxStreak = newStreak
@@ -354,12 +383,8 @@ func ProcessAnswerCheck(ctx context.Context, userID, questionID, submittedAnswer
 	}
 
 	newModuleAnswered := moduleAnswered + 1
-	newModuleCorrect := moduleCorrect
-	newModuleStreak := 0
-	if isCorrect {
-		newModuleCorrect++
-		newModuleStreak = moduleStreak + 1
-	}
+	newModuleCorrect := moduleCorrect + 1
+	newModuleStreak := moduleStreak + 1
 
 	_, err = tx.Exec(ctx, `
 		INSERT INTO module_stats (user_id, module_id, number_answered, number_correct, current_streak, last_answered_time)
@@ -377,33 +402,23 @@ func ProcessAnswerCheck(ctx context.Context, userID, questionID, submittedAnswer
 	// Log answer history
 	_, err = tx.Exec(ctx, `
 		INSERT INTO answer_history (user_id, question_id, module_id, is_correct, answered_at)
-		VALUES ($1, $2, $3, $4, $5)
-	`, userID, questionID, moduleID, isCorrect, now)
+		VALUES ($1, $2, $3, true, $4)
+	`, userID, questionID, moduleID, now)
 	if err != nil {
 		return nil, "", err
 	}
 
-	if isCorrect {
-		_, err = tx.Exec(ctx, `
-			INSERT INTO used_tokens (user_id, token) VALUES ($1, $2)
-		`, userID, token)
-		if err != nil {
-			return nil, "", err
-		}
-
-		var moduleName string
-		err = tx.QueryRow(ctx, `SELECT name FROM modules WHERE id = $1`, moduleID).Scan(&moduleName)
-		if err != nil {
-			return nil, "", err
-		}
+	moduleName, err := GetModuleNameByID(ctx, moduleID)
+	if err != nil {
+		return nil, "", err
+	}
 
-		_, err = tx.Exec(ctx, `
-			INSERT INTO activity_log (user_id, username, module_name, streak, answered_at)
-			VALUES ($1, $2, $3, $4, $5)
-		`, userID, username, moduleName, newStreak, now)
-		if err != nil {
-			return nil, "", err
-		}
+	_, err = tx.Exec(ctx, `
+		INSERT INTO activity_log (user_id, username, module_name, streak, answered_at)
+		VALUES ($1, $2, $3, $4, $5)
+	`, userID, username, moduleName, newStreak, now)
+	if err != nil {
+		return nil, "", err
 	}
 
 	if err := tx.Commit(ctx); err != nil {
@@ -411,7 +426,7 @@ func ProcessAnswerCheck(ctx context.Context, userID, questionID, submittedAnswer
 	}
 
 	return &AnswerResult{
-		Correct:       isCorrect,
+		Correct:       true,
 		NewStreak:     newStreak,
 		MaxStreak:     newMaxStreak,
 		TotalCorrect:  newCorrect,
@@ -419,6 +434,8 @@ func ProcessAnswerCheck(ctx context.Context, userID, questionID, submittedAnswer
 		ModuleStreak:  newModuleStreak,
 		ModuleCorrect: newModuleCorrect,
 		ModuleAnswers: newModuleAnswered,
+		ModuleName:    moduleName,
+		AnsweredAt:    now,
 	}, "", nil
 }
 
@@ -430,22 +447,128 @@ type RecentActivity struct {
 	AnsweredAt string `json:"answered_at"`
 }
 
+// userFlagCacheTTL bounds how stale a cached admin or PDF access flag can be.
+// Writes through this package update the caches directly, so the TTL only
+// matters for changes made outside this process.
+const userFlagCacheTTL = time.Minute
+
+type cachedFlag struct {
+	value   bool
+	expires time.Time
+}
+
+// flagCache holds one boolean per user with a TTL. Writes go through set,
+// which bumps gen; values read from the database go through fill, which is
+// skipped if a write happened since the read began so it can't put back the
+// value the write replaced.
+type flagCache struct {
+	mu    sync.RWMutex
+	flags map[string]cachedFlag
+	gen   uint64
+}
+
+func newFlagCache() *flagCache {
+	return &flagCache{flags: make(map[string]cachedFlag)}
+}
+
+func (c *flagCache) get(userID string) (value, ok bool) {
+	c.mu.RLock()
+	cached, found := c.flags[userID]
+	c.mu.RUnlock()
+	if !found || time.Now().After(cached.expires) {
+		return false, false
+	}
+	return cached.value, true
+}
+
+// generation returns the write generation to pass to fill. It must be read
+// before the database query whose result is being cached.
+func (c *flagCache) generation() uint64 {
+	c.mu.RLock()
+	defer c.mu.RUnlock()
+	return c.gen
+}
+
+func (c *flagCache) set(userID string, value bool) {
+	c.mu.Lock()
+	c.flags[userID] = cachedFlag{value: value, expires: time.Now().Add(userFlagCacheTTL)}
+	c.gen++
+	c.mu.Unlock()
+}
+
+func (c *flagCache) fill(userID string, value bool, gen uint64) {
+	c.mu.Lock()
+	if c.gen == gen {
+		c.flags[userID] = cachedFlag{value: value, expires: time.Now().Add(userFlagCacheTTL)}
+	}
+	c.mu.Unlock()
+}
+
+func (c *flagCache) cleanup() {
+	c.mu.Lock()
+	defer c.mu.Unlock()
+
+	now := time.Now()
+	for userID, cached := range c.flags {
+		if now.After(cached.expires) {
+			delete(c.flags, userID)
+		}
+	}
+}
+
+var (
+	adminCache     = newFlagCache()
+	pdfAccessCache = newFlagCache()
+)
+
+// StartUserFlagCacheCleanup periodically drops expired admin and PDF access
+// flags.
+func StartUserFlagCacheCleanup(interval time.Duration) {
+	go func() {
+		ticker := time.NewTicker(interval)
+		for range ticker.C {
+			adminCache.cleanup()
+			pdfAccessCache.cleanup()
+		}
+	}()
+}
+
 func IsUserAdmin(ctx context.Context, userID string) (bool, error) {
+	if isAdmin, ok := adminCache.get(userID); ok {
+		return isAdmin, nil
+	}
+	gen := adminCache.generation()
+
 	var isAdmin bool
 	err := db.Pool.QueryRow(ctx, `SELECT is_admin FROM user_stats WHERE user_id = $1`, userID).Scan(&isAdmin)
 	if err == pgx.ErrNoRows {
-		return false, nil
+		err = nil
+	}
+	if err != nil {
+		return false, err
 	}
-	return isAdmin, err
+	adminCache.fill(userID, isAdmin, gen)
+	return isAdmin, nil
 }
 
+// HasPDFAccess reports whether the user may view PDFs. It is checked on every
+// PDF request, so the answer is cached per user like the admin flag.
 func HasPDFAccess(ctx context.Context, userID string) (bool, error) {
+	if has, ok := pdfAccessCache.get(userID); ok {
+		return has, nil
+	}
+	gen := pdfAccessCache.generation()
+
 	var has bool
 	err := db.Pool.QueryRow(ctx, `SELECT has_pdf_access FROM user_stats WHERE user_id = $1`, userID).Scan(&has)
 	if err == pgx.ErrNoRows {
-		return false, nil
+		err = nil
+	}
+	if err != nil {
+		return false, err
 	}
-	return has, err
+	pdfAccessCache.fill(userID, has, gen)
+	return has, nil
 }
 
 func GrantPDFAccess(ctx context.Context, userID string) error {
@@ -454,17 +577,26 @@ func GrantPDFAccess(ctx context.Context, userID string) error {
 		VALUES ($1, '', 0, 0, 0, 0, 0, true)
 		ON CONFLICT (user_id) DO UPDATE SET has_pdf_access = true
 	`, userID)
+	if err == nil {
+		pdfAccessCache.set(userID, true)
+	}
 	return err
 }
 
 func RevokePDFAccess(ctx context.Context, userID string) error {
 	_, err := db.Pool.Exec(ctx, `UPDATE user_stats SET has_pdf_access = false WHERE user_id = $1`, userID)
+	if err == nil {
+		pdfAccessCache.set(userID, false)
+	}
 	return err
 }
 
 func ToggleAdmin(ctx context.Context, userID string) (bool, error) {
 	var newVal bool
 	err := db.Pool.QueryRow(ctx, `UPDATE user_stats SET is_admin = NOT is_admin WHERE user_id = $1 RETURNING is_admin`, userID).Scan(&newVal)
+	if err == nil {
+		adminCache.set(userID, newVal)
+	}
 	return newVal, err
 }
 
@@ -326,7 +326,7 @@ func (h *AdminHandler) GetQuestionForReport(w http.ResponseWriter, r *http.Reque
 		return
 	}
 
-	q, err := queries.GetLiveQuestion(ctx, questionID)
+	q, distractors, err := queries.GetLiveQuestion(ctx, questionID)
 	if err != nil {
 		log.Error().Err(err).Msg("Failed to get question")
 		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Failed to get question"})
@@ -337,15 +337,6 @@ func (h *AdminHandler) GetQuestionForReport(w http.ResponseWriter, r *http.Reque
 		return
 	}
 
-	distractors, err := queries.GetManualDistractorsForQuestion(ctx, questionID)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to get manual distractors")
-		distractors = nil
-	}
-	if distractors == nil {
-		distractors = []queries.LiveManualDistractor{}
-	}
-
 	writeJSON(w, http.StatusOK, map[string]interface{}{
 		"question":    q,
 		"distractors": distractors,
@@ -402,18 +393,21 @@ func (h *AdminHandler) ResolveReport(w http.ResponseWriter, r *http.Request) {
 		}
 	}
 
+	var deleteIDs, updateIDs []int
+	var updateTexts []string
 	for _, d := range req.Distractors {
-		if d.Type == "manual_distractor" {
-			if d.Delete {
-				if err := queries.DeleteManualDistractorByID(ctx, d.ID); err != nil {
-					log.Error().Err(err).Int("id", d.ID).Msg("Failed to delete manual distractor")
-				}
-			} else if d.NewText != "" {
-				if err := queries.UpdateManualDistractor(ctx, d.ID, d.NewText); err != nil {
-					log.Error().Err(err).Int("id", d.ID).Msg("Failed to update manual distractor")
-				}
-			}
+		if d.Type != "manual_distractor" {
+			continue
 		}
+		if d.Delete {
+			deleteIDs = append(deleteIDs, d.ID)
+		} else if d.NewText != "" {
+			updateIDs = append(updateIDs, d.ID)
+			updateTexts = append(updateTexts, d.NewText)
+		}
+	}
+	if err := queries.ApplyManualDistractorEdits(ctx, deleteIDs, updateIDs, updateTexts); err != nil {
+		log.Error().Err(err).Msg("Failed to apply manual distractor edits")
 	}
 
 	if err := queries.DeleteReportedQuestion(ctx, req.ReportID); err != nil {
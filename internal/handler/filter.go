@@ -4,7 +4,10 @@ import (
 	"encoding/json"
 	"net/http"
 	"sort"
+	"strconv"
 	"strings"
+	"sync"
+	"time"
 
 	"flashcards-go/internal/db/queries"
 
@@ -71,6 +74,31 @@ func (h *FilterHandler) GetFilters(w http.ResponseWriter, r *http.Request) {
 		subtopicNames[i] = s.Name
 	}
 
+	writeJSON(w, http.StatusOK, GetFiltersResponse{
+		Topics:    topicNames,
+		Subtopics: subtopicNames,
+		Tags:      tagFilterNames(tags),
+	})
+}
+
+// tagFilterNames flattens tag filter items into sorted, distinct names.
+func tagFilterNames(tags []queries.FilterItem) []string {
+	// The query groups by name and orders the result, so when no name needs
+	// splitting or trimming and the collation agrees with byte order the
+	// names can be used as they are.
+	tagNames := make([]string, len(tags))
+	clean := true
+	for i, t := range tags {
+		if t.Name == "" || strings.Contains(t.Name, ",") || strings.TrimSpace(t.Name) != t.Name {
+			clean = false
+			break
+		}
+		tagNames[i] = t.Name
+	}
+	if clean && sort.StringsAreSorted(tagNames) {
+		return tagNames
+	}
+
 	// Tags in the DB may be stored as comma-separated strings; split and deduplicate
 	tagSet := make(map[string]struct{})
 	for _, t := range tags {
@@ -81,23 +109,35 @@ func (h *FilterHandler) GetFilters(w http.ResponseWriter, r *http.Request) {
 			}
 		}
 	}
-	tagNames := make([]string, 0, len(tagSet))
+	tagNames = make([]string, 0, len(tagSet))
 	for name := range tagSet {
 		tagNames = append(tagNames, name)
 	}
 	sort.Strings(tagNames)
-
-	writeJSON(w, http.StatusOK, GetFiltersResponse{
-		Topics:    topicNames,
-		Subtopics: subtopicNames,
-		Tags:      tagNames,
-	})
+	return tagNames
 }
 
+// modulesResponse is the encoded /api/modules body. It expires together with
+// the module cache snapshot it was built from, so it is never staler than the
+// module cache itself.
+var (
+	modulesResponse        json.RawMessage
+	modulesResponseExpires time.Time
+	modulesResponseMu      sync.RWMutex
+)
+
 func (h *FilterHandler) GetModules(w http.ResponseWriter, r *http.Request) {
 	ctx := r.Context()
 
-	modules, err := queries.GetAllModules(ctx)
+	modulesResponseMu.RLock()
+	body, fresh := modulesResponse, time.Now().Before(modulesResponseExpires)
+	modulesResponseMu.RUnlock()
+	if fresh {
+		writeModulesResponse(w, body)
+		return
+	}
+
+	modules, expires, err := queries.GetAllModulesWithExpiry(ctx)
 	if err != nil {
 		log.Error().Err(err).Msg("Failed to get modules")
 		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Internal server error"})
@@ -125,8 +165,29 @@ func (h *FilterHandler) GetModules(w http.ResponseWriter, r *http.Request) {
 		result = append(result, ModuleGroup{Year: year, Modules: mods})
 	}
 
-	writeJSON(w, http.StatusOK, map[string]interface{}{
+	body, err = json.Marshal(map[string]interface{}{
 		"modules":       modules,
 		"module_groups": result,
 	})
+	if err != nil {
+		log.Error().Err(err).Msg("Failed to encode modules")
+		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Internal server error"})
+		return
+	}
+
+	modulesResponseMu.Lock()
+	modulesResponse = body
+	modulesResponseExpires = expires
+	modulesResponseMu.Unlock()
+
+	writeModulesResponse(w, body)
+}
+
+// writeModulesResponse sends the already-encoded modules body as is, rather
+// than passing it back through writeJSON's encoder.
+func writeModulesResponse(w http.ResponseWriter, body []byte) {
+	w.Header().Set("Content-Type", "application/json")
+	w.Header().Set("Content-Length", strconv.Itoa(len(body)))
+	w.WriteHeader(http.StatusOK)
+	w.Write(body)
 }
@@ -26,10 +26,10 @@ func (h *IngestHandler) APITokenAuth(next http.Handler) http.Handler {
 	return http.HandlerFunc(func(w http.ResponseWriter, r *http.Request) {
 		var token string
 
+		// Compare the scheme in place rather than lowercasing the whole header
 		authHeader := r.Header.Get("Authorization")
-		if strings.HasPrefix(strings.ToLower(authHeader), "bearer ") {
-			token = strings.TrimPrefix(authHeader, "Bearer ")
-			token = strings.TrimPrefix(token, "bearer ")
+		if len(authHeader) >= 7 && strings.EqualFold(authHeader[:7], "bearer ") {
+			token = authHeader[7:]
 		} else {
 			token = r.Header.Get("X-API-Key")
 		}
@@ -176,8 +176,8 @@ func (h *IngestHandler) IngestFlashcards(w http.ResponseWriter, r *http.Request)
 			tags = &tagsCSV
 		}
 
-		flashcardID, err := queries.InsertSubmittedFlashcard(ctx, userID, username, fc.Question, fc.Answer, fc.Module, topic, subtopic, tags)
-		if err != nil {
+		distractors := cleanDistractors(fc.Distractors, h.cfg.NumberOfDistractors)
+		if _, _, err := queries.InsertSubmittedFlashcard(ctx, userID, username, fc.Question, fc.Answer, fc.Module, topic, subtopic, tags, distractors); err != nil {
 			result.Errors = append(result.Errors, map[string]interface{}{
 				"index": i,
 				"error": err.Error(),
@@ -185,17 +185,6 @@ func (h *IngestHandler) IngestFlashcards(w http.ResponseWriter, r *http.Request)
 			continue
 		}
 
-		for j, distractor := range fc.Distractors {
-			if j >= h.cfg.NumberOfDistractors {
-				break
-			}
-			distractor = strings.TrimSpace(distractor)
-			if distractor != "" {
-				questionKey := "flashcard_" + strconv.Itoa(flashcardID)
-				queries.InsertSubmittedDistractor(ctx, userID, username, questionKey, distractor)
-			}
-		}
-
 		seenQuestions[seenKey] = true
 		result.Accepted = append(result.Accepted, map[string]interface{}{
 			"index":    i,
@@ -263,8 +252,7 @@ func (h *IngestHandler) SubmitDistractors(w http.ResponseWriter, r *http.Request
 			username = h.cfg.N8NDefaultUsername
 		}
 
-		question, _ := queries.GetQuestionByID(ctx, questionID)
-		if question == nil {
+		if exists, _ := queries.QuestionExists(ctx, questionID); !exists {
 			result["errors"] = append(result["errors"].([]map[string]interface{}), map[string]interface{}{
 				"index": i,
 				"error": "Question not found: " + questionID,
@@ -272,18 +260,19 @@ func (h *IngestHandler) SubmitDistractors(w http.ResponseWriter, r *http.Request
 			continue
 		}
 
-		count := 0
-		for j, d := range distractors {
-			if j >= h.cfg.NumberOfDistractors {
-				break
-			}
+		texts := make([]string, 0, len(distractors))
+		for _, d := range distractors {
 			text, _ := d.(string)
-			text = strings.TrimSpace(text)
-			if text != "" {
-				if err := queries.InsertSubmittedDistractor(ctx, userID, username, questionID, text); err == nil {
-					count++
-				}
-			}
+			texts = append(texts, text)
+		}
+		count, err := queries.InsertSubmittedDistractors(ctx, userID, username, questionID, cleanDistractors(texts, h.cfg.NumberOfDistractors))
+		if err != nil {
+			log.Error().Err(err).Msg("Failed to insert distractors")
+			result["errors"] = append(result["errors"].([]map[string]interface{}), map[string]interface{}{
+				"index": i,
+				"error": "Database error: " + err.Error(),
+			})
+			continue
 		}
 
 		if count == 0 {
@@ -3,10 +3,13 @@ package handler
 import (
 	"context"
 	"encoding/json"
+	"errors"
 	"io"
+	"mime/multipart"
 	"net/http"
 	"strconv"
 	"strings"
+	"time"
 
 	"flashcards-go/internal/auth"
 	"flashcards-go/internal/config"
@@ -15,6 +18,7 @@ import (
 
 	"github.com/go-chi/chi/v5"
 	"github.com/rs/zerolog/log"
+	"golang.org/x/sync/errgroup"
 )
 
 type PDFHandler struct {
@@ -75,7 +79,7 @@ func (h *PDFHandler) ServePDF(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
-	pdf, err := queries.GetPDFByID(ctx, pdfID)
+	pdf, err := queries.GetServablePDF(ctx, pdfID)
 	if err != nil || pdf == nil {
 		writeJSON(w, http.StatusNotFound, map[string]string{"error": "PDF not found"})
 		return
@@ -110,12 +114,13 @@ func (h *PDFHandler) ServeSubmittedPDF(w http.ResponseWriter, r *http.Request) {
 
 func (h *PDFHandler) servePDFData(w http.ResponseWriter, r *http.Request, storagePath, filename, mimeType string) {
 	ctx := r.Context()
-	data, contentType, err := h.storage.FetchFromStorage(ctx, storagePath)
+	body, contentType, size, err := h.storage.OpenFromStorage(ctx, storagePath)
 	if err != nil {
 		log.Error().Err(err).Str("path", storagePath).Msg("Failed to fetch PDF from storage")
 		writeJSON(w, http.StatusNotFound, map[string]string{"error": "PDF not found in storage"})
 		return
 	}
+	defer body.Close()
 
 	if contentType == "" {
 		contentType = mimeType
@@ -126,9 +131,13 @@ func (h *PDFHandler) servePDFData(w http.ResponseWriter, r *http.Request, storag
 
 	w.Header().Set("Content-Type", contentType)
 	w.Header().Set("Content-Disposition", `inline; filename="`+filename+`"`)
-	w.Header().Set("Content-Length", strconv.Itoa(len(data)))
+	if size >= 0 {
+		w.Header().Set("Content-Length", strconv.FormatInt(size, 10))
+	}
 	w.WriteHeader(http.StatusOK)
-	w.Write(data)
+	if _, err := io.Copy(w, body); err != nil {
+		log.Debug().Err(err).Str("path", storagePath).Msg("PDF stream interrupted")
+	}
 }
 
 type UploadPDFRequest struct {
@@ -147,25 +156,30 @@ func (h *PDFHandler) UploadPDF(w http.ResponseWriter, r *http.Request) {
 		userID = "api-upload"
 	}
 
-	if err := r.ParseMultipartForm(60 << 20); err != nil {
-		writeJSON(w, http.StatusBadRequest, map[string]string{"error": "Failed to parse form: " + err.Error()})
+	if !parseUploadForm(w, r, services.MaxPDFSize+uploadFormOverhead) {
 		return
 	}
 
-	file, header, err := r.FormFile("file")
-	if err != nil {
+	files := r.MultipartForm.File["file"]
+	if len(files) == 0 {
 		writeJSON(w, http.StatusBadRequest, map[string]string{"error": "No file provided"})
 		return
 	}
-	defer file.Close()
+	header := files[0]
+
+	if err := services.ValidatePDFSize(header.Size); err != nil {
+		writeJSON(w, http.StatusBadRequest, map[string]string{"error": err.Error()})
+		return
+	}
 
-	fileData, err := io.ReadAll(file)
+	file, err := header.Open()
 	if err != nil {
 		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Failed to read file"})
 		return
 	}
+	defer file.Close()
 
-	if err := services.ValidatePDF(fileData, header.Filename); err != nil {
+	if err := services.ValidatePDF(file, header.Size, header.Filename); err != nil {
 		writeJSON(w, http.StatusBadRequest, map[string]string{"error": err.Error()})
 		return
 	}
@@ -189,13 +203,19 @@ func (h *PDFHandler) UploadPDF(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
-	topicIDs := resolveIDsFromForm(ctx, r.Form["topic_names"], queries.GetOrCreateTopic)
-	subtopicIDs := resolveIDsFromForm(ctx, r.Form["subtopic_names"], queries.GetOrCreateSubtopic)
-	tagIDs := resolveIDsFromForm(ctx, r.Form["tag_names"], queries.GetOrCreateTag)
-
-	storagePath, err := h.storage.UploadToStorage(ctx, fileData, header.Filename)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to upload PDF to storage")
+	// The storage upload doesn't need the label ids, so resolve them while
+	// the file is being sent.
+	var storagePath string
+	var uploadErr error
+	uploaded := make(chan struct{})
+	go func() {
+		defer close(uploaded)
+		storagePath, uploadErr = h.storage.UploadToStorage(ctx, file, header.Size, header.Filename)
+	}()
+	topicIDs, subtopicIDs, tagIDs := resolveLabelsFromForm(ctx, r.Form["topic_names"], r.Form["subtopic_names"], r.Form["tag_names"])
+	<-uploaded
+	if uploadErr != nil {
+		log.Error().Err(uploadErr).Msg("Failed to upload PDF to storage")
 		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Failed to upload file"})
 		return
 	}
@@ -203,7 +223,7 @@ func (h *PDFHandler) UploadPDF(w http.ResponseWriter, r *http.Request) {
 	pdfInsert := queries.PDFInsert{
 		StoragePath:      storagePath,
 		OriginalFilename: header.Filename,
-		FileSize:         int64(len(fileData)),
+		FileSize:         header.Size,
 		MimeType:         "application/pdf",
 		ModuleID:         moduleID,
 		UploadedBy:       userID,
@@ -232,8 +252,7 @@ func (h *PDFHandler) BatchUploadPDF(w http.ResponseWriter, r *http.Request) {
 		userID = "api-upload"
 	}
 
-	if err := r.ParseMultipartForm(200 << 20); err != nil {
-		writeJSON(w, http.StatusBadRequest, map[string]string{"error": "Failed to parse form: " + err.Error()})
+	if !parseUploadForm(w, r, batchUploadMaxBytes) {
 		return
 	}
 
@@ -256,61 +275,52 @@ func (h *PDFHandler) BatchUploadPDF(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
-	topicIDs := resolveIDsFromForm(ctx, r.Form["topic_names"], queries.GetOrCreateTopic)
-	subtopicIDs := resolveIDsFromForm(ctx, r.Form["subtopic_names"], queries.GetOrCreateSubtopic)
-	tagIDs := resolveIDsFromForm(ctx, r.Form["tag_names"], queries.GetOrCreateTag)
-
 	files := r.MultipartForm.File["files"]
 	if len(files) == 0 {
 		writeJSON(w, http.StatusBadRequest, map[string]string{"error": "No files provided"})
 		return
 	}
 
-	var pendingIDs []int
-	var errors []string
-
-	for _, fileHeader := range files {
-		file, err := fileHeader.Open()
-		if err != nil {
-			errors = append(errors, fileHeader.Filename+": failed to open")
-			continue
-		}
-
-		fileData, err := io.ReadAll(file)
-		file.Close()
-		if err != nil {
-			errors = append(errors, fileHeader.Filename+": failed to read")
-			continue
-		}
-
-		if err := services.ValidatePDF(fileData, fileHeader.Filename); err != nil {
-			errors = append(errors, fileHeader.Filename+": "+err.Error())
-			continue
-		}
+	// Each file is an independent validation and storage upload, so run them
+	// concurrently and collect the outcomes in file order.
+	stored := make([]queries.PDFInsert, len(files))
+	fileErrors := make([]string, len(files))
+	var g errgroup.Group
+	g.SetLimit(batchUploadConcurrency)
+	for i, fileHeader := range files {
+		i, fileHeader := i, fileHeader
+		g.Go(func() error {
+			stored[i], fileErrors[i] = h.storeUploadedPDF(ctx, fileHeader, moduleID, userID)
+			return nil
+		})
+	}
+	topicIDs, subtopicIDs, tagIDs := resolveLabelsFromForm(ctx, r.Form["topic_names"], r.Form["subtopic_names"], r.Form["tag_names"])
+	g.Wait()
 
-		storagePath, err := h.storage.UploadToStorage(ctx, fileData, fileHeader.Filename)
-		if err != nil {
-			errors = append(errors, fileHeader.Filename+": upload failed")
-			continue
+	// Queue every stored file for review with a single insert.
+	var toInsert []queries.PDFInsert
+	for i := range files {
+		if fileErrors[i] == "" {
+			toInsert = append(toInsert, stored[i])
 		}
-
-		pdfInsert := queries.PDFInsert{
-			StoragePath:      storagePath,
-			OriginalFilename: fileHeader.Filename,
-			FileSize:         int64(len(fileData)),
-			MimeType:         "application/pdf",
-			ModuleID:         moduleID,
-			UploadedBy:       userID,
+	}
+	pendingIDs, err := queries.InsertSubmittedPDFs(ctx, toInsert, topicIDs, subtopicIDs, tagIDs)
+	if err != nil {
+		log.Error().Err(err).Msg("Failed to insert submitted PDFs")
+		for i := range files {
+			if fileErrors[i] == "" {
+				h.storage.DeleteFromStorage(ctx, stored[i].StoragePath)
+				fileErrors[i] = "database insert failed"
+			}
 		}
+		pendingIDs = nil
+	}
 
-		// Everyone goes through the pending approval queue
-		submittedID, err := queries.InsertSubmittedPDF(ctx, pdfInsert, topicIDs, subtopicIDs, tagIDs)
-		if err != nil {
-			h.storage.DeleteFromStorage(ctx, storagePath)
-			errors = append(errors, fileHeader.Filename+": database insert failed")
-			continue
+	var errors []string
+	for i, fileErr := range fileErrors {
+		if fileErr != "" {
+			errors = append(errors, files[i].Filename+": "+fileErr)
 		}
-		pendingIDs = append(pendingIDs, submittedID)
 	}
 
 	writeJSON(w, http.StatusOK, map[string]interface{}{
@@ -432,31 +442,20 @@ func (h *PDFHandler) UpdatePDF(w http.ResponseWriter, r *http.Request) {
 		}
 	}
 
-	if len(req.TopicIDs) > 0 {
-		queries.SetPDFTopics(ctx, pdfID, req.TopicIDs)
-	} else if len(req.TopicNames) > 0 {
-		ids := resolveIDsFromForm(ctx, req.TopicNames, queries.GetOrCreateTopic)
-		if len(ids) > 0 {
-			queries.SetPDFTopics(ctx, pdfID, ids)
-		}
-	}
-
-	if len(req.SubtopicIDs) > 0 {
-		queries.SetPDFSubtopics(ctx, pdfID, req.SubtopicIDs)
-	} else if len(req.SubtopicNames) > 0 {
-		ids := resolveIDsFromForm(ctx, req.SubtopicNames, queries.GetOrCreateSubtopic)
-		if len(ids) > 0 {
-			queries.SetPDFSubtopics(ctx, pdfID, ids)
-		}
-	}
-
-	if len(req.TagIDs) > 0 {
-		queries.SetPDFTags(ctx, pdfID, req.TagIDs)
-	} else if len(req.TagNames) > 0 {
-		ids := resolveIDsFromForm(ctx, req.TagNames, queries.GetOrCreateTag)
-		if len(ids) > 0 {
-			queries.SetPDFTags(ctx, pdfID, ids)
-		}
+	// Explicit ids win over names; names for every kind are resolved together
+	// and all three label sets are replaced in one transaction.
+	topicIDs, subtopicIDs, tagIDs := resolveLabelsFromForm(ctx,
+		namesWithoutIDs(req.TopicIDs, req.TopicNames),
+		namesWithoutIDs(req.SubtopicIDs, req.SubtopicNames),
+		namesWithoutIDs(req.TagIDs, req.TagNames))
+	err = queries.SetPDFLabels(ctx, pdfID,
+		labelIDs(req.TopicIDs, topicIDs),
+		labelIDs(req.SubtopicIDs, subtopicIDs),
+		labelIDs(req.TagIDs, tagIDs))
+	if err != nil {
+		log.Error().Err(err).Msg("Failed to update PDF labels")
+		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Failed to update PDF"})
+		return
 	}
 
 	pdf, _ := queries.GetPDFByID(ctx, pdfID)
@@ -505,10 +504,16 @@ func (h *PDFHandler) HardDeletePDF(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
+	// The row is already gone, so remove the file in the background instead
+	// of holding the response for a second round trip.
 	if storagePath != "" {
-		if err := h.storage.DeleteFromStorage(ctx, storagePath); err != nil {
-			log.Error().Err(err).Str("path", storagePath).Msg("Failed to delete PDF from storage")
-		}
+		go func() {
+			bgCtx, cancel := context.WithTimeout(context.Background(), storageDeleteTimeout)
+			defer cancel()
+			if err := h.storage.DeleteFromStorage(bgCtx, storagePath); err != nil {
+				log.Error().Err(err).Str("path", storagePath).Msg("Failed to delete PDF from storage")
+			}
+		}()
 	}
 
 	writeJSON(w, http.StatusOK, map[string]interface{}{
@@ -611,21 +616,125 @@ func (h *PDFHandler) RejectPDF(w http.ResponseWriter, r *http.Request) {
 	})
 }
 
-// resolveIDsFromForm resolves a list of name strings to IDs using a get-or-create function.
-// Handles both repeated form fields (["A", "B"]) and comma-separated values (["A,B"]).
-func resolveIDsFromForm(ctx context.Context, names []string, getOrCreate func(context.Context, string) (int, error)) []int {
-	var ids []int
+// storageDeleteTimeout bounds background storage deletes, which outlive the
+// request that started them.
+const storageDeleteTimeout = 30 * time.Second
+
+// batchUploadConcurrency caps how many files of a batch are uploaded to
+// storage at once.
+const batchUploadConcurrency = 8
+
+// storeUploadedPDF validates one uploaded file and uploads it to storage. It
+// returns the row to queue for review, or a short reason on failure.
+func (h *PDFHandler) storeUploadedPDF(ctx context.Context, fileHeader *multipart.FileHeader, moduleID int, userID string) (queries.PDFInsert, string) {
+	if err := services.ValidatePDFSize(fileHeader.Size); err != nil {
+		return queries.PDFInsert{}, err.Error()
+	}
+
+	file, err := fileHeader.Open()
+	if err != nil {
+		return queries.PDFInsert{}, "failed to read"
+	}
+	defer file.Close()
+
+	if err := services.ValidatePDF(file, fileHeader.Size, fileHeader.Filename); err != nil {
+		return queries.PDFInsert{}, err.Error()
+	}
+
+	storagePath, err := h.storage.UploadToStorage(ctx, file, fileHeader.Size, fileHeader.Filename)
+	if err != nil {
+		return queries.PDFInsert{}, "upload failed"
+	}
+
+	return queries.PDFInsert{
+		StoragePath:      storagePath,
+		OriginalFilename: fileHeader.Filename,
+		FileSize:         fileHeader.Size,
+		MimeType:         "application/pdf",
+		ModuleID:         moduleID,
+		UploadedBy:       userID,
+	}, ""
+}
+
+// uploadMemoryLimit is how much of a multipart upload is held in memory;
+// anything beyond it is spooled to temporary files by the multipart reader,
+// and uploads are streamed to storage from there.
+const uploadMemoryLimit = 8 << 20
+
+// uploadFormOverhead allows for the multipart headers and metadata fields
+// sent alongside the file in an upload.
+const uploadFormOverhead = 1 << 20
+
+// batchUploadMaxBytes caps the whole body of a batch upload.
+const batchUploadMaxBytes = 10*services.MaxPDFSize + uploadFormOverhead
+
+// parseUploadForm parses a multipart upload of at most limit bytes. Bodies
+// declaring a larger Content-Length are refused before anything is read, and
+// http.MaxBytesReader stops reading the rest as soon as they pass the limit,
+// so an oversized upload is never spooled in full.
+func parseUploadForm(w http.ResponseWriter, r *http.Request, limit int64) bool {
+	if r.ContentLength > limit {
+		writeJSON(w, http.StatusRequestEntityTooLarge, map[string]string{"error": "Upload is too large"})
+		return false
+	}
+	r.Body = http.MaxBytesReader(w, r.Body, limit)
+
+	if err := r.ParseMultipartForm(uploadMemoryLimit); err != nil {
+		var tooLarge *http.MaxBytesError
+		if errors.As(err, &tooLarge) {
+			writeJSON(w, http.StatusRequestEntityTooLarge, map[string]string{"error": "Upload is too large"})
+			return false
+		}
+		writeJSON(w, http.StatusBadRequest, map[string]string{"error": "Failed to parse form: " + err.Error()})
+		return false
+	}
+	return true
+}
+
+// resolveLabelsFromForm resolves topic, subtopic and tag names together
+// with a single query instead of one per table.
+func resolveLabelsFromForm(ctx context.Context, topicNames, subtopicNames, tagNames []string) (topicIDs, subtopicIDs, tagIDs []int) {
+	topicIDs, subtopicIDs, tagIDs, err := queries.GetOrCreatePDFLabels(ctx,
+		splitFormNames(topicNames), splitFormNames(subtopicNames), splitFormNames(tagNames))
+	if err != nil {
+		log.Error().Err(err).Msg("Failed to resolve names")
+		return nil, nil, nil
+	}
+	return topicIDs, subtopicIDs, tagIDs
+}
+
+// namesWithoutIDs returns names only when no explicit ids were given for the
+// same kind of label.
+func namesWithoutIDs(ids []int, names []string) []string {
+	if len(ids) > 0 {
+		return nil
+	}
+	return names
+}
+
+// labelIDs picks the ids to set for one kind of label, preferring explicit
+// ids over resolved names. nil leaves that kind unchanged.
+func labelIDs(ids, resolved []int) []int {
+	if len(ids) > 0 {
+		return ids
+	}
+	if len(resolved) > 0 {
+		return resolved
+	}
+	return nil
+}
+
+// splitFormNames flattens repeated and comma-separated name values into
+// trimmed, non-empty names.
+func splitFormNames(names []string) []string {
+	var cleaned []string
 	for _, raw := range names {
 		for _, name := range strings.Split(raw, ",") {
 			name = strings.TrimSpace(name)
-			if name == "" {
-				continue
-			}
-			id, err := getOrCreate(ctx, name)
-			if err == nil {
-				ids = append(ids, id)
+			if name != "" {
+				cleaned = append(cleaned, name)
 			}
 		}
 	}
-	return ids
+	return cleaned
 }
@@ -1,10 +1,13 @@
 package handler
 
 import (
+	"bytes"
 	"context"
 	"encoding/json"
 	"math/rand"
 	"net/http"
+	"strconv"
+	"sync"
 	"time"
 
 	"flashcards-go/internal/auth"
@@ -17,6 +20,9 @@ import (
 	"golang.org/x/sync/errgroup"
 )
 
+// questionPDFCount is how many matching PDFs are attached to a question.
+const questionPDFCount = 3
+
 type QuestionHandler struct {
 	cfg *config.Config
 	hub *realtime.Hub
@@ -84,47 +90,17 @@ func (h *QuestionHandler) GetQuestion(w http.ResponseWriter, r *http.Request) {
 	}
 
 	// Try to get a prefetched question first (fast path)
-	var prefetched *security.PrefetchedQuestion
+	var question *security.PrefetchedQuestion
 	if req.QuestionID == "" {
 		queue := security.GetUserQueue(userID)
 		if queue != nil && queue.ModuleID == moduleID {
-			prefetched = queue.Pop()
+			question = queue.Pop()
 		}
 	}
 
-	var resp GetQuestionResponse
-
-	if prefetched != nil {
-		// Fast path: use prefetched question
-		token := security.GenerateSignedToken(prefetched.QuestionID, userID)
-		security.CacheAnswer(token, prefetched.QuestionID, prefetched.Answer, moduleID)
-
-		// Get PDFs in background or skip for speed
-		var pdfs []queries.PDF
-		pdfs, _ = queries.GetPDFsForQuestion(ctx, prefetched.QuestionID, 3)
-
-		resp = GetQuestionResponse{
-			Question:       prefetched.Question,
-			Answers:        prefetched.Answers,
-			AnswerIDs:      prefetched.AnswerIDs,
-			AnswerTypes:    prefetched.AnswerTypes,
-			AnswerMetadata: prefetched.AnswerMetadata,
-			Module:         req.Module,
-			Topic:          joinStrings(prefetched.Topics),
-			Subtopic:       joinStrings(prefetched.Subtopics),
-			Tags:           prefetched.Tags,
-			PDFs:           pdfs,
-			QuestionID:     prefetched.QuestionID,
-			Token:          token,
-			IsAdmin:        isAdmin,
-		}
-
-		// Trigger background prefetch to refill queue
-		security.TriggerPrefetch(userID, moduleID, req.Topics, req.Subtopics, req.Tags)
-
-	} else {
+	if question == nil {
 		// Slow path: fetch from database
-		question, answers, answerIDs, answerTypes, answerMetadata, err := h.fetchQuestionWithDistractors(ctx, moduleID, req.Topics, req.Subtopics, req.Tags, req.QuestionID, nil)
+		question, err = h.fetchQuestionWithDistractors(ctx, moduleID, req.Topics, req.Subtopics, req.Tags, req.QuestionID, nil)
 		if err != nil {
 			log.Error().Err(err).Msg("Failed to get question")
 			writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Internal error"})
@@ -135,102 +111,94 @@ func (h *QuestionHandler) GetQuestion(w http.ResponseWriter, r *http.Request) {
 			writeJSON(w, http.StatusOK, map[string]string{"error": "No questions found matching the criteria."})
 			return
 		}
+	}
 
-		token := security.GenerateSignedToken(question.ID, userID)
-		security.CacheAnswer(token, question.ID, question.Answer, moduleID)
-
-		pdfs, _ := queries.GetPDFsForQuestion(ctx, question.ID, 3)
-
-		resp = GetQuestionResponse{
-			Question:       question.Question,
-			Answers:        answers,
-			AnswerIDs:      answerIDs,
-			AnswerTypes:    answerTypes,
-			AnswerMetadata: answerMetadata,
-			Module:         req.Module,
-			Topic:          joinStrings(question.Topics),
-			Subtopic:       joinStrings(question.Subtopics),
-			Tags:           question.Tags,
-			PDFs:           pdfs,
-			QuestionID:     question.ID,
-			Token:          token,
-			IsAdmin:        isAdmin,
-		}
+	token := security.GenerateSignedToken(question.QuestionID, userID)
+	security.CacheAnswer(token, userID, question.QuestionID, question.Answer, moduleID)
 
-		// Start prefetching for next questions
-		security.TriggerPrefetch(userID, moduleID, req.Topics, req.Subtopics, req.Tags)
+	pdfs, _ := queries.GetPDFsForQuestion(ctx, question.QuestionID, questionPDFCount)
+
+	resp := GetQuestionResponse{
+		Question:       question.Question,
+		Answers:        question.Answers,
+		AnswerIDs:      question.AnswerIDs,
+		AnswerTypes:    question.AnswerTypes,
+		AnswerMetadata: question.AnswerMetadata,
+		Module:         req.Module,
+		Topic:          joinStrings(question.Topics),
+		Subtopic:       joinStrings(question.Subtopics),
+		Tags:           question.Tags,
+		PDFs:           pdfs,
+		QuestionID:     question.QuestionID,
+		Token:          token,
+		IsAdmin:        isAdmin,
 	}
 
+	// Refill the prefetch queue for the next questions
+	security.TriggerPrefetch(userID, moduleID, req.Topics, req.Subtopics, req.Tags)
+
 	writeJSON(w, http.StatusOK, resp)
 }
 
-func (h *QuestionHandler) fetchQuestionWithDistractors(ctx context.Context, moduleID int, topics, subtopics, tags []string, specificID string, excludeIDs []string) (*queries.Question, []string, []string, []string, []*int, error) {
-	var question *queries.Question
-	var manualDistractors, smartDistractors []queries.Distractor
-
-	g, gctx := errgroup.WithContext(ctx)
-
-	g.Go(func() error {
-		var err error
-		question, err = queries.GetRandomQuestionExcluding(gctx, moduleID, topics, subtopics, tags, specificID, excludeIDs)
-		return err
-	})
-
-	if err := g.Wait(); err != nil {
-		return nil, nil, nil, nil, nil, err
+// fetchQuestionWithDistractors loads a random matching question and builds its
+// shuffled answer options. It serves both GetQuestion and the prefetch queue.
+func (h *QuestionHandler) fetchQuestionWithDistractors(ctx context.Context, moduleID int, topics, subtopics, tags []string, specificID string, excludeIDs []string) (*security.PrefetchedQuestion, error) {
+	question, manualDistractors, err := queries.GetRandomQuestionWithDistractors(ctx, moduleID, topics, subtopics, tags, specificID, excludeIDs, h.cfg.NumberOfDistractors)
+	if err != nil {
+		return nil, err
 	}
-
 	if question == nil {
-		return nil, nil, nil, nil, nil, nil
+		return nil, nil
 	}
 
-	g2, gctx2 := errgroup.WithContext(ctx)
-
-	g2.Go(func() error {
-		var err error
-		manualDistractors, err = queries.GetManualDistractors(gctx2, question.ID, h.cfg.NumberOfDistractors)
-		return err
-	})
-
-	g2.Go(func() error {
-		var err error
-		smartDistractors, err = queries.GetSmartDistractors(gctx2, question.ID, moduleID, question.Topics, question.Subtopics, question.Tags, h.cfg.NumberOfDistractors)
-		return err
-	})
+	// Smart distractors and the PDF matches only depend on the chosen
+	// question, so look them up concurrently. The PDF lookup just warms the
+	// PDF cache; GetQuestion reads it back, including for prefetched questions.
+	g, gctx := errgroup.WithContext(ctx)
 
-	if err := g2.Wait(); err != nil {
-		return nil, nil, nil, nil, nil, err
+	var smartDistractors []queries.Distractor
+	if remaining := h.cfg.NumberOfDistractors - len(manualDistractors); remaining > 0 {
+		g.Go(func() error {
+			var err error
+			smartDistractors, err = queries.GetSmartDistractors(gctx, question.ID, moduleID, question.Topics, question.Subtopics, question.Tags, remaining)
+			return err
+		})
 	}
 
-	var allDistractors []queries.Distractor
-	allDistractors = append(allDistractors, manualDistractors...)
-	allDistractors = append(allDistractors, smartDistractors...)
+	g.Go(func() error {
+		if _, err := queries.GetPDFsForQuestion(gctx, question.ID, questionPDFCount); err != nil {
+			log.Warn().Err(err).Str("question_id", question.ID).Msg("Failed to load PDFs for question")
+		}
+		return nil
+	})
 
-	if len(allDistractors) > h.cfg.NumberOfDistractors {
-		allDistractors = allDistractors[:h.cfg.NumberOfDistractors]
+	if err := g.Wait(); err != nil {
+		return nil, err
 	}
 
-	answers := []string{question.Answer}
-	answerIDs := []string{question.ID}
-	answerTypes := []string{"question"}
-	answerMetadata := []*int{nil}
-
-	for _, d := range allDistractors {
-		answers = append(answers, d.Answer)
-		answerIDs = append(answerIDs, d.ID)
-		answerTypes = append(answerTypes, d.Type)
-		answerMetadata = append(answerMetadata, d.Metadata)
+	// Shuffle the options as one slice of structs, then split them into the
+	// parallel slices the response uses.
+	options := make([]queries.Distractor, 0, 1+len(manualDistractors)+len(smartDistractors))
+	options = append(options, queries.Distractor{ID: question.ID, Answer: question.Answer, Type: "question"})
+	options = append(options, manualDistractors...)
+	options = append(options, smartDistractors...)
+	if len(options) > h.cfg.NumberOfDistractors+1 {
+		options = options[:h.cfg.NumberOfDistractors+1]
 	}
+	rand.Shuffle(len(options), func(i, j int) {
+		options[i], options[j] = options[j], options[i]
+	})
 
-	shuffleAnswers(answers, answerIDs, answerTypes, answerMetadata)
-
-	return question, answers, answerIDs, answerTypes, answerMetadata, nil
-}
-
-func (h *QuestionHandler) prefetchQuestion(ctx context.Context, userID string, moduleID int, topics, subtopics, tags []string, excludeIDs []string) (*security.PrefetchedQuestion, error) {
-	question, answers, answerIDs, answerTypes, answerMetadata, err := h.fetchQuestionWithDistractors(ctx, moduleID, topics, subtopics, tags, "", excludeIDs)
-	if err != nil || question == nil {
-		return nil, err
+	n := len(options)
+	answers := make([]string, n)
+	answerIDs := make([]string, n)
+	answerTypes := make([]string, n)
+	answerMetadata := make([]*int, n)
+	for i, o := range options {
+		answers[i] = o.Answer
+		answerIDs[i] = o.ID
+		answerTypes[i] = o.Type
+		answerMetadata[i] = o.Metadata
 	}
 
 	return &security.PrefetchedQuestion{
@@ -248,6 +216,10 @@ func (h *QuestionHandler) prefetchQuestion(ctx context.Context, userID string, m
 	}, nil
 }
 
+func (h *QuestionHandler) prefetchQuestion(ctx context.Context, userID string, moduleID int, topics, subtopics, tags []string, excludeIDs []string) (*security.PrefetchedQuestion, error) {
+	return h.fetchQuestionWithDistractors(ctx, moduleID, topics, subtopics, tags, "", excludeIDs)
+}
+
 type CheckAnswerRequest struct {
 	Answer string `json:"answer"`
 	Token  string `json:"token"`
@@ -274,86 +246,92 @@ func (h *QuestionHandler) CheckAnswer(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
-	questionID, valid := security.VerifySignedToken(req.Token, userID)
-	if !valid {
-		writeJSON(w, http.StatusBadRequest, map[string]string{"error": "Invalid or expired token"})
-		return
-	}
-
-	// Try to get answer from cache first (fast path - no DB query)
-	cached := security.GetCachedAnswer(req.Token)
+	// Try to get answer from cache first (fast path - no HMAC or DB query)
+	cached := security.GetVerifiedCachedAnswer(req.Token, userID)
 
+	var questionID string
 	var isCorrect bool
 	var moduleID int
 
 	if cached != nil {
 		// Fast path: answer is cached
+		questionID = cached.QuestionID
 		isCorrect = req.Answer == cached.CorrectAnswer
 		moduleID = cached.ModuleID
 	} else {
+		var valid bool
+		questionID, valid = security.VerifySignedToken(req.Token, userID)
+		if !valid {
+			writeJSON(w, http.StatusBadRequest, map[string]string{"error": "Invalid or expired token"})
+			return
+		}
+
 		// Slow path: need to query DB (shouldn't happen often)
-		question, err := queries.GetQuestionByID(ctx, questionID)
-		if err != nil || question == nil {
+		answer, qModuleID, found, err := queries.GetQuestionAnswer(ctx, questionID)
+		if err != nil || !found {
 			writeJSON(w, http.StatusBadRequest, map[string]string{"error": "Question not found"})
 			return
 		}
-		isCorrect = req.Answer == question.Answer
-		moduleID = question.ModuleID
+		isCorrect = req.Answer == answer
+		moduleID = qModuleID
 	}
 
 	// Only update stats on correct answer (and only once per token)
 	if isCorrect {
-		// Check if token already used
-		used, err := queries.IsTokenUsed(ctx, userID, req.Token)
-		if err != nil {
-			log.Error().Err(err).Msg("Failed to check token")
-		}
-
-		if !used {
-			// Update stats in background - don't block the response
-			go func() {
-				bgCtx := context.Background()
-				result, _, err := queries.ProcessAnswerCheck(bgCtx, userID, questionID, req.Answer, req.Token, username)
-				if err != nil {
-					log.Error().Err(err).Msg("Failed to process answer stats")
-					return
-				}
-
-				// Get module name for broadcast
-				mn, _ := queries.GetModuleNameByID(bgCtx, moduleID)
+		// Update stats in background - don't block the response. The token is
+		// claimed atomically inside RecordCorrectAnswer, which returns a nil
+		// result if it was already used.
+		go func() {
+			// Cached tokens are claimed in-process first, so repeat submissions
+			// of an already-recorded answer never reach the database.
+			if cached != nil && !security.ClaimCachedAnswer(req.Token) {
+				return
+			}
 
-				// Get approved cards count for leaderboard
-				userStats, _ := queries.GetUserStats(bgCtx, userID)
-				approvedCards := 0
-				if userStats != nil {
-					approvedCards = userStats.ApprovedCards
+			bgCtx := context.Background()
+			result, _, err := queries.RecordCorrectAnswer(bgCtx, userID, questionID, moduleID, req.Token, username)
+			if err != nil {
+				log.Error().Err(err).Msg("Failed to process answer stats")
+				// The used_tokens insert is the authority; nothing was
+				// recorded, so let a retry claim the token again.
+				if cached != nil {
+					security.ReleaseCachedAnswer(req.Token)
 				}
+				return
+			}
+			if result == nil {
+				return
+			}
 
-				if h.hub != nil && result != nil {
-					h.hub.BroadcastActivity(realtime.ActivityEvent{
-						UserID:     userID,
-						Username:   username,
-						ModuleName: mn,
-						Streak:     result.ModuleStreak,
-					})
-
-					h.hub.BroadcastLeaderboardUpdate(realtime.LeaderboardUpdate{
-						UserID:         userID,
-						Username:       username,
-						ModuleID:       moduleID,
-						CorrectAnswers: result.TotalCorrect,
-						TotalAnswers:   result.TotalAnswers,
-						CurrentStreak:  result.NewStreak,
-						MaxStreak:      result.MaxStreak,
-						ApprovedCards:  approvedCards,
-						LastAnswerTime: time.Now().Format(time.RFC3339),
-					})
-				}
-			}()
-		}
+			// Get approved cards count for leaderboard
+			userStats, _ := queries.GetUserStats(bgCtx, userID)
+			approvedCards := 0
+			if userStats != nil {
+				approvedCards = userStats.ApprovedCards
+			}
 
-		// Clean up cache entry
-		security.DeleteCachedAnswer(req.Token)
+			if h.hub != nil {
+				h.hub.BroadcastActivity(realtime.ActivityEvent{
+					UserID:     userID,
+					Username:   username,
+					ModuleName: result.ModuleName,
+					Streak:     result.ModuleStreak,
+					AnsweredAt: result.AnsweredAt,
+				})
+
+				h.hub.BroadcastLeaderboardUpdate(realtime.LeaderboardUpdate{
+					UserID:         userID,
+					Username:       username,
+					ModuleID:       moduleID,
+					CorrectAnswers: result.TotalCorrect,
+					TotalAnswers:   result.TotalAnswers,
+					CurrentStreak:  result.NewStreak,
+					MaxStreak:      result.MaxStreak,
+					ApprovedCards:  approvedCards,
+					LastAnswerTime: result.AnsweredAt.Format(time.RFC3339),
+				})
+			}
+		}()
 	} else {
 		// Wrong answer - reset streak in background
 		go func() {
@@ -366,17 +344,6 @@ func (h *QuestionHandler) CheckAnswer(w http.ResponseWriter, r *http.Request) {
 	writeJSON(w, http.StatusOK, CheckAnswerResponse{Correct: isCorrect})
 }
 
-func shuffleAnswers(answers []string, ids []string, types []string, metadata []*int) {
-	n := len(answers)
-	for i := n - 1; i > 0; i-- {
-		j := rand.Intn(i + 1)
-		answers[i], answers[j] = answers[j], answers[i]
-		ids[i], ids[j] = ids[j], ids[i]
-		types[i], types[j] = types[j], types[i]
-		metadata[i], metadata[j] = metadata[j], metadata[i]
-	}
-}
-
 func joinStrings(s []string) string {
 	if len(s) == 0 {
 		return ""
@@ -388,8 +355,43 @@ func joinStrings(s []string) string {
 	return result
 }
 
+// pooledEncoder keeps a json.Encoder bound to its buffer so both are reused
+// across responses.
+type pooledEncoder struct {
+	buf bytes.Buffer
+	enc *json.Encoder
+}
+
+var jsonBufPool = sync.Pool{
+	New: func() interface{} {
+		e := new(pooledEncoder)
+		e.enc = json.NewEncoder(&e.buf)
+		return e
+	},
+}
+
+// writeJSON encodes data into a pooled buffer first so the response goes out
+// in a single write with a Content-Length, and encoding failures become a 500
+// instead of a truncated body.
 func writeJSON(w http.ResponseWriter, status int, data interface{}) {
+	e := jsonBufPool.Get().(*pooledEncoder)
+	buf := &e.buf
+	buf.Reset()
+	defer func() {
+		// Don't keep buffers grown by unusually large responses.
+		if buf.Cap() <= 1<<20 {
+			jsonBufPool.Put(e)
+		}
+	}()
+
+	if err := e.enc.Encode(data); err != nil {
+		log.Error().Err(err).Msg("Failed to encode JSON response")
+		http.Error(w, `{"error": "Internal server error"}`, http.StatusInternalServerError)
+		return
+	}
+
 	w.Header().Set("Content-Type", "application/json")
+	w.Header().Set("Content-Length", strconv.Itoa(buf.Len()))
 	w.WriteHeader(status)
-	json.NewEncoder(w).Encode(data)
+	w.Write(buf.Bytes())
 }
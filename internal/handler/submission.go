@@ -65,29 +65,14 @@ func (h *SubmissionHandler) SubmitFlashcard(w http.ResponseWriter, r *http.Reque
 		tags = &req.Tags
 	}
 
-	flashcardID, err := queries.InsertSubmittedFlashcard(ctx, userID, username, req.Question, req.Answer, req.Module, topic, subtopic, tags)
+	distractors := cleanDistractors(req.Distractors, h.cfg.NumberOfDistractors)
+	_, distractorCount, err := queries.InsertSubmittedFlashcard(ctx, userID, username, req.Question, req.Answer, req.Module, topic, subtopic, tags, distractors)
 	if err != nil {
 		log.Error().Err(err).Msg("Failed to insert flashcard")
 		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Failed to submit flashcard"})
 		return
 	}
 
-	distractorCount := 0
-	for i, distractor := range req.Distractors {
-		if i >= h.cfg.NumberOfDistractors {
-			break
-		}
-		distractor = strings.TrimSpace(distractor)
-		if distractor != "" {
-			questionKey := "flashcard_" + strconv.Itoa(flashcardID)
-			if err := queries.InsertSubmittedDistractor(ctx, userID, username, questionKey, distractor); err != nil {
-				log.Error().Err(err).Msg("Failed to insert distractor")
-			} else {
-				distractorCount++
-			}
-		}
-	}
-
 	message := "Flashcard submitted for review! Thank you."
 	if distractorCount > 0 {
 		message = "Flashcard and distractors submitted for review! Thank you."
@@ -120,21 +105,18 @@ func (h *SubmissionHandler) SubmitDistractor(w http.ResponseWriter, r *http.Requ
 		return
 	}
 
-	count := 0
-	for i, distractor := range req.Distractors {
-		if i >= h.cfg.NumberOfDistractors {
-			break
-		}
-		distractor = strings.TrimSpace(distractor)
-		if distractor != "" {
-			if err := queries.InsertSubmittedDistractor(ctx, userID, username, req.QuestionID, distractor); err != nil {
-				log.Error().Err(err).Msg("Failed to insert distractor")
-			} else {
-				count++
-			}
-		}
+	distractors := cleanDistractors(req.Distractors, h.cfg.NumberOfDistractors)
+	if len(distractors) == 0 {
+		writeJSON(w, http.StatusBadRequest, map[string]string{"error": "Please provide at least one distractor"})
+		return
 	}
 
+	count, err := queries.InsertSubmittedDistractors(ctx, userID, username, req.QuestionID, distractors)
+	if err != nil {
+		log.Error().Err(err).Msg("Failed to insert distractors")
+		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Failed to submit distractors"})
+		return
+	}
 	if count == 0 {
 		writeJSON(w, http.StatusBadRequest, map[string]string{"error": "Please provide at least one distractor"})
 		return
@@ -146,6 +128,20 @@ func (h *SubmissionHandler) SubmitDistractor(w http.ResponseWriter, r *http.Requ
 	})
 }
 
+// cleanDistractors trims the first limit distractors and drops empty ones.
+func cleanDistractors(distractors []string, limit int) []string {
+	if len(distractors) > limit {
+		distractors = distractors[:limit]
+	}
+	cleaned := make([]string, 0, len(distractors))
+	for _, d := range distractors {
+		if d = strings.TrimSpace(d); d != "" {
+			cleaned = append(cleaned, d)
+		}
+	}
+	return cleaned
+}
+
 type ReportQuestionRequest struct {
 	Question    string  `json:"question"`
 	QuestionID  *string `json:"question_id"`
@@ -1,10 +1,11 @@
 package handler
 
 import (
+	"context"
 	"encoding/csv"
-	"fmt"
 	"net/http"
 	"strconv"
+	"sync"
 	"time"
 
 	"flashcards-go/internal/auth"
@@ -24,45 +25,50 @@ func (h *UserHandler) GetStats(w http.ResponseWriter, r *http.Request) {
 	ctx := r.Context()
 	userID := auth.GetUserID(ctx)
 
-	stats, err := queries.GetUserStats(ctx, userID)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to get user stats")
-		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Internal error"})
-		return
-	}
-
-	if stats == nil {
-		writeJSON(w, http.StatusNotFound, map[string]string{"error": "User not found"})
-		return
-	}
-
-	moduleStats, err := queries.GetUserModuleStats(ctx, userID)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to get module stats")
-		moduleStats = nil
-	}
-
-	rank, totalUsers, err := queries.GetUserRank(ctx, userID)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to get user rank")
-		rank, totalUsers = 0, 0
-	}
-
-	writeJSON(w, http.StatusOK, map[string]interface{}{
-		"user_stats":   stats,
-		"module_stats": moduleStats,
-		"rank":         rank,
-		"total_users":  totalUsers,
-	})
+	writeUserStats(ctx, w, userID)
 }
 
 func (h *UserHandler) GetUserStats(w http.ResponseWriter, r *http.Request) {
 	ctx := r.Context()
 	userID := chi.URLParam(r, "userID")
 
-	stats, err := queries.GetUserStats(ctx, userID)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to get user stats")
+	writeUserStats(ctx, w, userID)
+}
+
+// writeUserStats responds with a user's overall stats, per-module stats and
+// rank. The three lookups are independent, so they run concurrently.
+func writeUserStats(ctx context.Context, w http.ResponseWriter, userID string) {
+	var (
+		stats            *queries.UserStats
+		statsErr         error
+		moduleStats      []queries.ModuleStats
+		rank, totalUsers int
+		wg               sync.WaitGroup
+	)
+	wg.Add(2)
+	go func() {
+		defer wg.Done()
+		var err error
+		moduleStats, err = queries.GetUserModuleStats(ctx, userID)
+		if err != nil {
+			log.Error().Err(err).Msg("Failed to get module stats")
+			moduleStats = nil
+		}
+	}()
+	go func() {
+		defer wg.Done()
+		var err error
+		rank, totalUsers, err = queries.GetUserRank(ctx, userID)
+		if err != nil {
+			log.Error().Err(err).Msg("Failed to get user rank")
+			rank, totalUsers = 0, 0
+		}
+	}()
+	stats, statsErr = queries.GetUserStats(ctx, userID)
+	wg.Wait()
+
+	if statsErr != nil {
+		log.Error().Err(statsErr).Msg("Failed to get user stats")
 		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Internal error"})
 		return
 	}
@@ -72,18 +78,6 @@ func (h *UserHandler) GetUserStats(w http.ResponseWriter, r *http.Request) {
 		return
 	}
 
-	moduleStats, err := queries.GetUserModuleStats(ctx, userID)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to get module stats")
-		moduleStats = nil
-	}
-
-	rank, totalUsers, err := queries.GetUserRank(ctx, userID)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to get user rank")
-		rank, totalUsers = 0, 0
-	}
-
 	writeJSON(w, http.StatusOK, map[string]interface{}{
 		"user_stats":   stats,
 		"module_stats": moduleStats,
@@ -261,39 +255,38 @@ func (h *UserHandler) ExportLeaderboardCSV(w http.ResponseWriter, r *http.Reques
 		}
 	}
 
-	entries, err := queries.GetLeaderboard(ctx, sort, order, moduleID, 10000)
-	if err != nil {
-		log.Error().Err(err).Msg("Failed to get leaderboard")
-		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Internal error"})
-		return
-	}
-
-	w.Header().Set("Content-Type", "text/csv")
-	w.Header().Set("Content-Disposition", `attachment; filename="leaderboard-`+time.Now().Format("2006-01-02")+`.csv"`)
-
+	// Rows are written as they are read, so the export never holds the
+	// whole leaderboard in memory. Headers go out with the first row, which
+	// leaves room for a JSON error if the query fails before any output.
 	writer := csv.NewWriter(w)
-	defer writer.Flush()
-
-	// Write header row
-	if err := writer.Write([]string{
-		"rank",
-		"user_id",
-		"username",
-		"correct_answers",
-		"total_answers",
-		"accuracy",
-		"current_streak",
-		"max_streak",
-		"approved_cards",
-		"last_answer_time",
-	}); err != nil {
-		log.Error().Err(err).Msg("Failed to write CSV header")
-		return
+	started := false
+	start := func() error {
+		started = true
+		w.Header().Set("Content-Type", "text/csv")
+		w.Header().Set("Content-Disposition", `attachment; filename="leaderboard-`+time.Now().Format("2006-01-02")+`.csv"`)
+		return writer.Write([]string{
+			"rank",
+			"user_id",
+			"username",
+			"correct_answers",
+			"total_answers",
+			"accuracy",
+			"current_streak",
+			"max_streak",
+			"approved_cards",
+			"last_answer_time",
+		})
 	}
 
-	// Write data rows
-	for i, entry := range entries {
-		rank := i + 1
+	rank := 0
+	row := make([]string, 10)
+	err := queries.EachLeaderboardEntry(ctx, sort, order, moduleID, 10000, func(entry *queries.LeaderboardEntry) error {
+		if !started {
+			if err := start(); err != nil {
+				return err
+			}
+		}
+		rank++
 
 		var accuracy float64
 		if entry.TotalAnswers > 0 {
@@ -305,22 +298,29 @@ func (h *UserHandler) ExportLeaderboardCSV(w http.ResponseWriter, r *http.Reques
 			lastAnswerTime = entry.LastAnswerTime.Format(time.RFC3339)
 		}
 
-		row := []string{
-			strconv.Itoa(rank),
-			entry.UserID,
-			entry.Username,
-			strconv.Itoa(entry.CorrectAnswers),
-			strconv.Itoa(entry.TotalAnswers),
-			fmt.Sprintf("%.2f", accuracy),
-			strconv.Itoa(entry.CurrentStreak),
-			strconv.Itoa(entry.MaxStreak),
-			strconv.Itoa(entry.ApprovedCards),
-			lastAnswerTime,
-		}
-
-		if err := writer.Write(row); err != nil {
-			log.Error().Err(err).Msg("Failed to write CSV row")
-			return
+		row[0] = strconv.Itoa(rank)
+		row[1] = entry.UserID
+		row[2] = entry.Username
+		row[3] = strconv.Itoa(entry.CorrectAnswers)
+		row[4] = strconv.Itoa(entry.TotalAnswers)
+		row[5] = strconv.FormatFloat(accuracy, 'f', 2, 64)
+		row[6] = strconv.Itoa(entry.CurrentStreak)
+		row[7] = strconv.Itoa(entry.MaxStreak)
+		row[8] = strconv.Itoa(entry.ApprovedCards)
+		row[9] = lastAnswerTime
+		return writer.Write(row)
+	})
+	if err != nil && !started {
+		log.Error().Err(err).Msg("Failed to get leaderboard")
+		writeJSON(w, http.StatusInternalServerError, map[string]string{"error": "Internal error"})
+		return
+	}
+	if err != nil {
+		log.Error().Err(err).Msg("Failed to write leaderboard CSV")
+	} else if !started {
+		if err := start(); err != nil {
+			log.Error().Err(err).Msg("Failed to write CSV header")
 		}
 	}
+	writer.Flush()
 }
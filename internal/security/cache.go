@@ -6,10 +6,12 @@ import (
 )
 
 type CachedAnswer struct {
+	UserID        string
 	QuestionID    string
 	CorrectAnswer string
 	ModuleID      int
 	CreatedAt     time.Time
+	Claimed       bool
 }
 
 var (
@@ -17,11 +19,12 @@ var (
 	cacheMu     sync.RWMutex
 )
 
-func CacheAnswer(token string, questionID, correctAnswer string, moduleID int) {
+func CacheAnswer(token string, userID, questionID, correctAnswer string, moduleID int) {
 	cacheMu.Lock()
 	defer cacheMu.Unlock()
 	
 	answerCache[token] = &CachedAnswer{
+		UserID:        userID,
 		QuestionID:    questionID,
 		CorrectAnswer: correctAnswer,
 		ModuleID:      moduleID,
@@ -35,10 +38,45 @@ func GetCachedAnswer(token string) *CachedAnswer {
 	return answerCache[token]
 }
 
-func DeleteCachedAnswer(token string) {
+// GetVerifiedCachedAnswer returns the cache entry for a token this process
+// issued to userID that has not yet expired. Such a token needs no HMAC check,
+// which matters when the same token is resubmitted. A nil result means the
+// caller must fall back to VerifySignedToken.
+func GetVerifiedCachedAnswer(token, userID string) *CachedAnswer {
+	cached := GetCachedAnswer(token)
+	if cached == nil || cached.UserID != userID {
+		return nil
+	}
+	if time.Since(cached.CreatedAt) > time.Duration(tokenExpirySeconds)*time.Second {
+		return nil
+	}
+	return cached
+}
+
+// ClaimCachedAnswer marks a cached token as answered correctly and reports
+// whether this call was the first to do so. Claimed entries stay cached until
+// they expire, so repeat submissions are still answered from memory.
+func ClaimCachedAnswer(token string) bool {
+	cacheMu.Lock()
+	defer cacheMu.Unlock()
+
+	cached, ok := answerCache[token]
+	if !ok || cached.Claimed {
+		return false
+	}
+	cached.Claimed = true
+	return true
+}
+
+// ReleaseCachedAnswer undoes ClaimCachedAnswer when the answer could not be
+// recorded, so a retry of the same token is not dropped.
+func ReleaseCachedAnswer(token string) {
 	cacheMu.Lock()
 	defer cacheMu.Unlock()
-	delete(answerCache, token)
+
+	if cached, ok := answerCache[token]; ok {
+		cached.Claimed = false
+	}
 }
 
 func CleanupExpiredCache(maxAge time.Duration) {
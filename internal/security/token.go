@@ -1,68 +1,101 @@
 package security
 
 import (
+	"bytes"
 	"crypto/hmac"
 	"crypto/sha256"
 	"encoding/base64"
-	"fmt"
+	"hash"
 	"strconv"
 	"strings"
+	"sync"
 	"time"
 )
 
-var tokenSecretKey string
+// tokenSecretKey is kept as bytes so signing doesn't convert the key on every call.
+var tokenSecretKey []byte
 var tokenExpirySeconds int64 = 600
 
+// maxTokenLen is well above any real token (ids, timestamp and a 32-byte
+// MAC), so oversized input is rejected before it is decoded.
+const maxTokenLen = 512
+
+// tokenMACs pools keyed HMAC states. Reset restores a used HMAC to its keyed
+// state without hashing the padded key again, so only the payload is hashed
+// per token.
+var tokenMACs sync.Pool
+
 func Init(secretKey string) {
-	tokenSecretKey = secretKey
+	tokenSecretKey = []byte(secretKey)
+	tokenMACs = sync.Pool{New: func() interface{} {
+		return hmac.New(sha256.New, tokenSecretKey)
+	}}
 }
 
 func SetTokenExpiry(seconds int) {
 	tokenExpirySeconds = int64(seconds)
 }
 
+// appendSignature appends the raw HMAC-SHA256 of payload under the token key
+// to dst.
+func appendSignature(dst, payload []byte) []byte {
+	h := tokenMACs.Get().(hash.Hash)
+	h.Write(payload)
+	dst = h.Sum(dst)
+	h.Reset()
+	tokenMACs.Put(h)
+	return dst
+}
+
+// GenerateSignedToken returns base64("questionID:userID:timestamp:" + mac),
+// where mac is the raw 32-byte signature of everything before the last colon.
 func GenerateSignedToken(questionID, userID string) string {
-	timestamp := time.Now().Unix()
-	payload := fmt.Sprintf("%s:%s:%d", questionID, userID, timestamp)
-	
-	h := hmac.New(sha256.New, []byte(tokenSecretKey))
-	h.Write([]byte(payload))
-	signature := fmt.Sprintf("%x", h.Sum(nil))
-	
-	token := base64.URLEncoding.EncodeToString([]byte(fmt.Sprintf("%s:%s", payload, signature)))
-	return token
+	payload := make([]byte, 0, len(questionID)+len(userID)+2+20+1+sha256.Size)
+	payload = append(payload, questionID...)
+	payload = append(payload, ':')
+	payload = append(payload, userID...)
+	payload = append(payload, ':')
+	payload = strconv.AppendInt(payload, time.Now().Unix(), 10)
+
+	signed := len(payload)
+	payload = append(payload, ':')
+	payload = appendSignature(payload, payload[:signed])
+
+	return base64.RawURLEncoding.EncodeToString(payload)
 }
 
 func VerifySignedToken(token, userID string) (questionID string, valid bool) {
-	decoded, err := base64.URLEncoding.DecodeString(token)
+	if len(token) > maxTokenLen {
+		return "", false
+	}
+	decoded, err := base64.RawURLEncoding.DecodeString(token)
 	if err != nil {
 		return "", false
 	}
-	
-	parts := strings.Split(string(decoded), ":")
-	if len(parts) != 4 {
+
+	// The signature is a fixed-size suffix behind the last separator.
+	sep := len(decoded) - sha256.Size - 1
+	if sep < 0 || decoded[sep] != ':' {
 		return "", false
 	}
-	
-	tokenQuestionID := parts[0]
-	tokenUserID := parts[1]
-	timestampStr := parts[2]
-	signature := parts[3]
-	
-	if tokenUserID != userID {
+	payload, signature := decoded[:sep], decoded[sep+1:]
+
+	// Peel the timestamp and user id off the end, so the fields are sliced
+	// in place and a colon in a question id can't shift them.
+	tsSep := bytes.LastIndexByte(payload, ':')
+	if tsSep < 0 {
+		return "", false
+	}
+	userSep := bytes.LastIndexByte(payload[:tsSep], ':')
+	if userSep < 0 {
 		return "", false
 	}
-	
-	payload := fmt.Sprintf("%s:%s:%s", tokenQuestionID, tokenUserID, timestampStr)
-	h := hmac.New(sha256.New, []byte(tokenSecretKey))
-	h.Write([]byte(payload))
-	expectedSig := fmt.Sprintf("%x", h.Sum(nil))
-	
-	if !hmac.Equal([]byte(signature), []byte(expectedSig)) {
+
+	if string(payload[userSep+1:tsSep]) != userID {
 		return "", false
 	}
-	
-	timestamp, err := strconv.ParseInt(timestampStr, 10, 64)
+
+	timestamp, err := strconv.ParseInt(string(payload[tsSep+1:]), 10, 64)
 	if err != nil {
 		return "", false
 	}
@@ -71,7 +104,12 @@ func VerifySignedToken(token, userID string) (questionID string, valid bool) {
 		return "", false
 	}
 
-	return tokenQuestionID, true
+	var expected [sha256.Size]byte
+	if !hmac.Equal(signature, appendSignature(expected[:0], payload)) {
+		return "", false
+	}
+
+	return string(payload[:userSep]), true
 }
 
 func VerifyIngestToken(token, expectedToken string) bool {
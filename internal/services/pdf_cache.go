@@ -0,0 +1,91 @@
+package services
+
+import (
+	"container/list"
+	"sync"
+	"time"
+)
+
+// Storage paths are prefixed with a fresh UUID on upload, so the bytes behind
+// a path never change and can be kept in memory until evicted.
+const (
+	pdfCacheTTL       = 10 * time.Minute
+	pdfCacheMaxBytes  = 64 << 20 // total bytes held across all cached PDFs
+	pdfCacheMaxObject = 8 << 20  // larger files are always fetched from storage
+)
+
+type cachedPDF struct {
+	path        string
+	data        []byte
+	contentType string
+	expires     time.Time
+}
+
+var (
+	pdfCache      = make(map[string]*list.Element)
+	pdfCacheLRU   = list.New()
+	pdfCacheBytes int
+	pdfCacheMu    sync.Mutex
+)
+
+// getCachedPDF returns the cached bytes for storagePath and marks them as
+// recently used.
+func getCachedPDF(storagePath string) ([]byte, string, bool) {
+	pdfCacheMu.Lock()
+	defer pdfCacheMu.Unlock()
+
+	elem, ok := pdfCache[storagePath]
+	if !ok {
+		return nil, "", false
+	}
+	entry := elem.Value.(*cachedPDF)
+	if time.Now().After(entry.expires) {
+		removeCachedPDF(elem)
+		return nil, "", false
+	}
+	pdfCacheLRU.MoveToFront(elem)
+	return entry.data, entry.contentType, true
+}
+
+// cachePDF stores a downloaded PDF, evicting the least recently used entries
+// until the cache fits in pdfCacheMaxBytes.
+func cachePDF(storagePath string, data []byte, contentType string) {
+	if len(data) > pdfCacheMaxObject {
+		return
+	}
+
+	pdfCacheMu.Lock()
+	defer pdfCacheMu.Unlock()
+
+	if elem, ok := pdfCache[storagePath]; ok {
+		removeCachedPDF(elem)
+	}
+	for pdfCacheBytes+len(data) > pdfCacheMaxBytes {
+		removeCachedPDF(pdfCacheLRU.Back())
+	}
+
+	pdfCache[storagePath] = pdfCacheLRU.PushFront(&cachedPDF{
+		path:        storagePath,
+		data:        data,
+		contentType: contentType,
+		expires:     time.Now().Add(pdfCacheTTL),
+	})
+	pdfCacheBytes += len(data)
+}
+
+// evictCachedPDF drops storagePath from the cache, if present.
+func evictCachedPDF(storagePath string) {
+	pdfCacheMu.Lock()
+	defer pdfCacheMu.Unlock()
+
+	if elem, ok := pdfCache[storagePath]; ok {
+		removeCachedPDF(elem)
+	}
+}
+
+// removeCachedPDF unlinks an entry. Callers must hold pdfCacheMu.
+func removeCachedPDF(elem *list.Element) {
+	entry := pdfCacheLRU.Remove(elem).(*cachedPDF)
+	delete(pdfCache, entry.path)
+	pdfCacheBytes -= len(entry.data)
+}
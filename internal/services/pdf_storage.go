@@ -21,6 +21,20 @@ const (
 	PDFMimeType  = "application/pdf"
 )
 
+// storageClient is shared by all storage calls. http.DefaultTransport keeps
+// only two idle connections per host, so concurrent PDF requests would keep
+// opening new TLS connections to Supabase Storage.
+var storageClient = &http.Client{
+	Transport: newStorageTransport(),
+}
+
+func newStorageTransport() *http.Transport {
+	t := http.DefaultTransport.(*http.Transport).Clone()
+	t.MaxIdleConns = 32
+	t.MaxIdleConnsPerHost = 16
+	return t
+}
+
 type PDFStorageService struct {
 	cfg *config.Config
 }
@@ -29,23 +43,25 @@ func NewPDFStorageService(cfg *config.Config) *PDFStorageService {
 	return &PDFStorageService{cfg: cfg}
 }
 
-// UploadToStorage uploads a file to Supabase Storage and returns the storage path
-func (s *PDFStorageService) UploadToStorage(ctx context.Context, fileData []byte, filename string) (string, error) {
+// UploadToStorage streams size bytes from body to Supabase Storage and returns
+// the storage path
+func (s *PDFStorageService) UploadToStorage(ctx context.Context, body io.Reader, size int64, filename string) (string, error) {
 	// Generate unique storage path
 	storagePath := fmt.Sprintf("%s/%s", uuid.New().String(), secureFilename(filename))
 
 	url := fmt.Sprintf("%s/storage/v1/object/%s/%s", s.cfg.SupabaseURL, PDFBucket, storagePath)
 
-	req, err := http.NewRequestWithContext(ctx, "POST", url, bytes.NewReader(fileData))
+	req, err := http.NewRequestWithContext(ctx, "POST", url, body)
 	if err != nil {
 		return "", fmt.Errorf("failed to create upload request: %w", err)
 	}
+	req.ContentLength = size
 
 	req.Header.Set("Authorization", "Bearer "+s.cfg.SupabaseServiceRoleKey)
 	req.Header.Set("Content-Type", PDFMimeType)
 	req.Header.Set("x-upsert", "true")
 
-	resp, err := http.DefaultClient.Do(req)
+	resp, err := storageClient.Do(req)
 	if err != nil {
 		return "", fmt.Errorf("failed to upload to storage: %w", err)
 	}
@@ -65,6 +81,7 @@ func (s *PDFStorageService) DeleteFromStorage(ctx context.Context, storagePath s
 	if storagePath == "" {
 		return nil
 	}
+	evictCachedPDF(storagePath)
 
 	url := fmt.Sprintf("%s/storage/v1/object/%s/%s", s.cfg.SupabaseURL, PDFBucket, storagePath)
 
@@ -75,7 +92,7 @@ func (s *PDFStorageService) DeleteFromStorage(ctx context.Context, storagePath s
 
 	req.Header.Set("Authorization", "Bearer "+s.cfg.SupabaseServiceRoleKey)
 
-	resp, err := http.DefaultClient.Do(req)
+	resp, err := storageClient.Do(req)
 	if err != nil {
 		return fmt.Errorf("failed to delete from storage: %w", err)
 	}
@@ -104,7 +121,7 @@ func (s *PDFStorageService) GetSignedURL(ctx context.Context, storagePath string
 	req.Header.Set("Authorization", "Bearer "+s.cfg.SupabaseServiceRoleKey)
 	req.Header.Set("Content-Type", "application/json")
 
-	resp, err := http.DefaultClient.Do(req)
+	resp, err := storageClient.Do(req)
 	if err != nil {
 		return "", fmt.Errorf("failed to get signed URL: %w", err)
 	}
@@ -118,31 +135,33 @@ func (s *PDFStorageService) GetSignedURL(ctx context.Context, storagePath string
 	return "", nil
 }
 
-// FetchFromStorage retrieves a file from Supabase Storage
-func (s *PDFStorageService) FetchFromStorage(ctx context.Context, storagePath string) ([]byte, string, error) {
+// OpenFromStorage opens a file in Supabase Storage for reading and returns its
+// content type and size (-1 if unknown). Recently fetched small files are
+// served from memory; larger ones are streamed straight from storage so they
+// are never held in memory whole. The caller must close the reader.
+func (s *PDFStorageService) OpenFromStorage(ctx context.Context, storagePath string) (io.ReadCloser, string, int64, error) {
+	if data, contentType, ok := getCachedPDF(storagePath); ok {
+		return io.NopCloser(bytes.NewReader(data)), contentType, int64(len(data)), nil
+	}
+
 	url := fmt.Sprintf("%s/storage/v1/object/%s/%s", s.cfg.SupabaseURL, PDFBucket, storagePath)
 
 	req, err := http.NewRequestWithContext(ctx, "GET", url, nil)
 	if err != nil {
-		return nil, "", fmt.Errorf("failed to create fetch request: %w", err)
+		return nil, "", 0, fmt.Errorf("failed to create fetch request: %w", err)
 	}
 
 	req.Header.Set("Authorization", "Bearer "+s.cfg.SupabaseServiceRoleKey)
 
-	resp, err := http.DefaultClient.Do(req)
+	resp, err := storageClient.Do(req)
 	if err != nil {
-		return nil, "", fmt.Errorf("failed to fetch from storage: %w", err)
+		return nil, "", 0, fmt.Errorf("failed to fetch from storage: %w", err)
 	}
-	defer resp.Body.Close()
 
 	if resp.StatusCode != http.StatusOK {
 		body, _ := io.ReadAll(resp.Body)
-		return nil, "", fmt.Errorf("storage fetch failed with status %d: %s", resp.StatusCode, string(body))
-	}
-
-	data, err := io.ReadAll(resp.Body)
-	if err != nil {
-		return nil, "", fmt.Errorf("failed to read response body: %w", err)
+		resp.Body.Close()
+		return nil, "", 0, fmt.Errorf("storage fetch failed with status %d: %s", resp.StatusCode, string(body))
 	}
 
 	contentType := resp.Header.Get("Content-Type")
@@ -150,14 +169,34 @@ func (s *PDFStorageService) FetchFromStorage(ctx context.Context, storagePath st
 		contentType = PDFMimeType
 	}
 
-	return data, contentType, nil
+	if resp.ContentLength < 0 || resp.ContentLength > pdfCacheMaxObject {
+		return resp.Body, contentType, resp.ContentLength, nil
+	}
+
+	data, err := io.ReadAll(resp.Body)
+	resp.Body.Close()
+	if err != nil {
+		return nil, "", 0, fmt.Errorf("failed to read response body: %w", err)
+	}
+
+	cachePDF(storagePath, data, contentType)
+	return io.NopCloser(bytes.NewReader(data)), contentType, int64(len(data)), nil
 }
 
-// ValidatePDF checks if the file is a valid PDF
-func ValidatePDF(data []byte, filename string) error {
-	if len(data) > MaxPDFSize {
+// ValidatePDFSize rejects files larger than MaxPDFSize
+func ValidatePDFSize(size int64) error {
+	if size > MaxPDFSize {
 		return fmt.Errorf("file size exceeds maximum of %d MB", MaxPDFSize/(1024*1024))
 	}
+	return nil
+}
+
+// ValidatePDF checks if the file is a valid PDF. Only the magic bytes are
+// read, so the file can still be streamed from the start afterwards.
+func ValidatePDF(file io.ReaderAt, size int64, filename string) error {
+	if err := ValidatePDFSize(size); err != nil {
+		return err
+	}
 
 	ext := strings.ToLower(filepath.Ext(filename))
 	if ext != ".pdf" {
@@ -165,7 +204,8 @@ func ValidatePDF(data []byte, filename string) error {
 	}
 
 	// Check PDF magic bytes
-	if len(data) < 4 || string(data[:4]) != "%PDF" {
+	magic := make([]byte, 4)
+	if _, err := file.ReadAt(magic, 0); err != nil || string(magic) != "%PDF" {
 		return fmt.Errorf("file does not appear to be a valid PDF")
 	}
 
@@ -0,0 +1,8 @@
+-- Indexes backing the per-module filter lookups (GetModuleFilterData).
+-- The filter query starts from questions in a module and walks the link
+-- tables back to the topic/subtopic/tag names.
+
+CREATE INDEX IF NOT EXISTS idx_questions_module_id ON questions (module_id, id);
+CREATE INDEX IF NOT EXISTS idx_question_topics_question_topic ON question_topics (question_id, topic_id);
+CREATE INDEX IF NOT EXISTS idx_question_subtopics_question_subtopic ON question_subtopics (question_id, subtopic_id);
+CREATE INDEX IF NOT EXISTS idx_question_tags_question_tag ON question_tags (question_id, tag_id);
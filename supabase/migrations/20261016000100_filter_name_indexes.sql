@@ -0,0 +1,13 @@
+-- Name lookups used by the question filters and smart distractor scoring.
+-- Both resolve topic/subtopic/tag names to ids through the unique name
+-- indexes the admin upserts already rely on (ON CONFLICT (name)), then probe
+-- the link tables, which are covered by the (question_id, X_id) indexes
+-- added in 20261016000000_filter_indexes.sql. Refresh the planner
+-- statistics for both sides.
+
+ANALYZE topics;
+ANALYZE subtopics;
+ANALYZE tags;
+ANALYZE question_topics;
+ANALYZE question_subtopics;
+ANALYZE question_tags;
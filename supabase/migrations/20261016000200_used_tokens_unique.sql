@@ -0,0 +1,10 @@
+-- ProcessAnswerCheck claims a token with INSERT ... ON CONFLICT DO NOTHING
+-- RETURNING, which only detects reuse if (user_id, token) is unique.
+
+DELETE FROM used_tokens a
+USING used_tokens b
+WHERE a.ctid < b.ctid
+  AND a.user_id = b.user_id
+  AND a.token = b.token;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_used_tokens_user_token ON used_tokens (user_id, token);
@@ -0,0 +1,5 @@
+-- Manual distractors are read per question ordered by id (the question
+-- payload query and the report review both do this), so a (question_id, id)
+-- index serves them in order without a sort.
+
+CREATE INDEX IF NOT EXISTS idx_manual_distractors_question_id ON manual_distractors (question_id, id);
@@ -0,0 +1,5 @@
+-- Reports submitted without a question id are linked to their question by
+-- exact text match. Question text can exceed the btree entry size limit, so a
+-- hash index serves the equality lookup.
+
+CREATE INDEX IF NOT EXISTS idx_questions_question_hash ON questions USING hash (question);
@@ -0,0 +1,6 @@
+-- /api/pdf/{id} reads storage_path, original_filename, mime_type and is_active
+-- by id on every request. Covering those columns lets the lookup be an
+-- index-only scan. is_active is included rather than used as a partial-index
+-- predicate so inactive PDFs still get their own "no longer available" error.
+
+CREATE INDEX IF NOT EXISTS idx_pdfs_serve ON pdfs (id) INCLUDE (storage_path, original_filename, mime_type, is_active);
@@ -0,0 +1,6 @@
+-- Approving or rejecting a submitted flashcard rewrites or deletes its pending
+-- distractors by question_id ('flashcard_<id>'), and counts what is left for
+-- the new question. Index the column so these stay off a sequential scan as
+-- the moderation queue grows.
+
+CREATE INDEX IF NOT EXISTS idx_submitted_distractors_question_id ON submitted_distractors (question_id);
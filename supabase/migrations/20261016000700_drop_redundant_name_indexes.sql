@@ -0,0 +1,7 @@
+-- An earlier revision of 20261016000100_filter_name_indexes.sql added
+-- (name, id) indexes on topics, subtopics and tags. The unique indexes on
+-- name already serve those lookups, so the extra indexes only cost writes.
+
+DROP INDEX IF EXISTS idx_topics_name;
+DROP INDEX IF EXISTS idx_subtopics_name;
+DROP INDEX IF EXISTS idx_tags_name;